@@ -4,14 +4,13 @@
 
 import os
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from core import llm_registry
 
 # Load environment variables from .env
 load_dotenv()
 
 # Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-MODEL_NAME = "llama-3.1-8b-instant"  # ✅ UPDATED model name
 
 # Prompt Template
 DRAFT_PROMPT = """
@@ -44,25 +43,28 @@ Please draft a full reply that {full_name} can send as-is.
 """
 
 
-def draft_reply(summary: str, full_name: str = "Anil Kumar") -> str:
-    """Generates a draft email reply given a summary."""
+def draft_reply(summary: str, full_name: str = "Anil Kumar", use_cache: bool = True) -> str:
+    """Generates a draft email reply given a summary (use_cache=False forces a fresh draft)."""
     if not GROQ_API_KEY:
         raise ValueError("GROQ_API_KEY environment variable is not set.")
 
-    llm = ChatGroq(
-        api_key=GROQ_API_KEY,
-        model=MODEL_NAME,
-        temperature=0.3,
-    )
+    prompt = DRAFT_PROMPT.format(full_name=full_name, summary=summary)
 
-    prompt = DRAFT_PROMPT.format(full_name=full_name)
-
-    # Call Groq model
-    response = llm.invoke(prompt)
+    # Call Groq model (shared, pooled client from the registry)
+    response = llm_registry.invoke("drafter", prompt, use_cache=use_cache)
 
     return response.content.strip()
 
 
+def stream_draft_reply(summary: str, full_name: str = "Anil Kumar", use_cache: bool = True):
+    """Same as draft_reply, but yields the draft text in pieces as the model generates it."""
+    if not GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY environment variable is not set.")
+
+    prompt = DRAFT_PROMPT.format(full_name=full_name, summary=summary)
+    yield from llm_registry.stream("drafter", prompt, use_cache=use_cache)
+
+
 # Quick manual test if running this file directly
 if __name__ == "__main__":
     sample_summary = "The client is asking if you're available for a project kickoff meeting next Monday afternoon."
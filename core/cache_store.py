@@ -0,0 +1,123 @@
+"""Persistent key → JSON cache in a standalone SQLite file, with LRU eviction and optional TTL."""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from core import metrics
+
+
+class SQLiteLRUCache:
+    """
+    Small on-disk cache shared by every process that opens the same file.
+
+    Entries are evicted least-recently-used once `max_entries` is exceeded and
+    ignored (then purged) once older than `ttl_seconds`, if a TTL is set.
+    Hits and misses are counted in core.metrics as "<name>.hits" / "<name>.misses"
+    for this process, and in the file itself for every process since the last clear().
+    """
+
+    def __init__(self, path, name, max_entries=10_000, ttl_seconds=None):
+        self.path = Path(path)
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Yields a connection that commits on success and is always closed."""
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            self._ensure_schema(conn)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_schema(self, conn):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS cache ("
+                        " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                        " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_last_used ON cache (last_used)")
+                    conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                    conn.commit()
+                    self._ready = True
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                row = None
+            outcome = "misses" if row is None else "hits"
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1)"
+                " ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                (outcome,),
+            )
+            if row is not None:
+                conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, key))
+        metrics.incr(f"{self.name}.{outcome}")
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            if self.ttl_seconds is not None:
+                conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            overflow = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+            conn.execute("DELETE FROM counters")
+
+    def stats(self):
+        """
+        Entry count plus hits, misses and hit rate, both for this process and
+        ("total_*") for every process that used the file since the last clear().
+        """
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            totals = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        hits = metrics.get(f"{self.name}.hits")
+        misses = metrics.get(f"{self.name}.misses")
+        total_hits = totals.get("hits", 0)
+        total_misses = totals.get("misses", 0)
+        return {
+            "entries": entries,
+            "hits": int(hits),
+            "misses": int(misses),
+            "hit_rate": _rate(hits, misses),
+            "total_hits": total_hits,
+            "total_misses": total_misses,
+            "total_hit_rate": _rate(total_hits, total_misses),
+        }
+
+
+def _rate(hits, misses):
+    lookups = hits + misses
+    return round(hits / lookups, 3) if lookups else 0.0
@@ -1,12 +1,11 @@
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import pytz
 import re
 
-from core.email_service import get_credentials, load_settings
+from core.email_service import get_calendar_service
+from core.settings_store import get_settings, get_timezone
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +13,7 @@ logger = logging.getLogger(__name__)
 def list_availability(date_strs: List[str]) -> Dict[str, Any]:
     """Returns a list of events per date in structured format."""
     try:
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
+        service = get_calendar_service()
         availability = {}
 
         for date_str in date_strs:
@@ -53,12 +51,11 @@ def list_availability(date_strs: List[str]) -> Dict[str, Any]:
 def schedule_meeting(emails: List[str], title: str, start_time: str, end_time: str) -> Dict[str, Any]:
     """Schedules a meeting and returns the result including Meet link."""
     try:
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
+        service = get_calendar_service()
 
-        settings = load_settings()
-        timezone = settings.get("timezone", "Asia/Kolkata")
-        creator_email = settings.get("monitored_email", "me")
+        settings = get_settings()
+        timezone = settings.timezone
+        creator_email = settings.monitored_email or "me"
 
         # Ensure creator is invited
         emails = list(set(emails + [creator_email]))
@@ -99,11 +96,9 @@ def schedule_meeting(emails: List[str], title: str, start_time: str, end_time: s
 
 
 def convert_to_local(iso_str: str) -> str:
-    settings = load_settings()
-    tz = settings.get("timezone", "Asia/Kolkata")
     try:
         dt = datetime.fromisoformat(iso_str.replace("Z", "+00:00"))
-        local_dt = dt.astimezone(pytz.timezone(tz))
+        local_dt = dt.astimezone(get_timezone())
         return local_dt.strftime("%Y-%m-%d %I:%M %p %Z")
     except Exception:
         return iso_str
@@ -122,11 +117,9 @@ def add_calendar_reminder(title: str, start_time: str) -> Dict[str, Any]:
         start_time: ISO format (e.g. "2024-06-06T15:00:00") in local time zone.
     """
     try:
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
+        service = get_calendar_service()
 
-        settings = load_settings()
-        timezone = settings.get("timezone", "Asia/Kolkata")
+        timezone = get_settings().timezone
 
         # Calculate 30-minute end time
         start_dt = datetime.fromisoformat(start_time)
@@ -3,13 +3,28 @@
 import yaml
 import os
 
+from core.settings_store import FileCache
+
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "settings.yaml")
 
+
+def _parse_config(path):
+    with open(path, "r") as file:
+        return yaml.safe_load(file) or {}
+
+
+def _missing_config():
+    print(f"⚠️ Error loading config: {CONFIG_PATH} not found")
+    return {}
+
+
+_config = FileCache(CONFIG_PATH, _parse_config, _missing_config)
+
+
 def get_config(config=None):
-    """Loads configuration from settings.yaml."""
+    """Loads configuration from settings.yaml (re-parsed only when the file changes)."""
     try:
-        with open(CONFIG_PATH, "r") as file:
-            settings = yaml.safe_load(file)
+        settings = _config.get()
         return settings if config is None else settings.get(config, {})
     except Exception as e:
         print(f"⚠️ Error loading config: {e}")
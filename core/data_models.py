@@ -9,3 +9,16 @@ class State(BaseModel):
 
 class RespondTo(BaseModel):
     response: str  # Can be "email", "notify", or "no"
+
+
+# Triage labels and the subtypes allowed under each of them
+TRIAGE_SUBTYPES = {
+    "email": ["INFO_REQUEST", "QUOTE_PROPOSAL", "SUPPORT_ISSUE", "FEEDBACK_COMPLAINT",
+              "MEETING_INVITE", "SCHEDULE_REQUEST", "DEADLINE_TASK"],
+    "notify": ["RESULT", "UPCOMING_EVENT", "ALERT"],
+    "no": ["SPAM", "PROMOTION", "SOCIAL"],
+}
+
+
+def is_valid_triage(label: str, subtype: str) -> bool:
+    return subtype in TRIAGE_SUBTYPES.get(label, [])
@@ -1,3 +1,4 @@
+import threading
 from datetime import datetime, timezone
 from contextlib import contextmanager
 from pathlib import Path
@@ -10,19 +11,26 @@ from sqlalchemy import (
     Text,
     DateTime,
     Boolean,
+    Float,
     ForeignKey,
+    inspect,
+    text,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 # ── DB location:  app/data/emails.db  ───────────────────────────────────────────
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-DATA_DIR.mkdir(exist_ok=True)
 DB_URL = f"sqlite:///{DATA_DIR / 'emails.db'}"
 
-engine = create_engine(DB_URL, future=True, echo=False)
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+# The engine (and data directory) are created on first use, not at import time;
+# SessionLocal is bound to it then.
+SessionLocal = sessionmaker(expire_on_commit=False)
 Base = declarative_base()
 
+_engine = None
+_engine_lock = threading.Lock()
+_schema_ready = False
+
 # ──────────────────────────────── MODELS ────────────────────────────────────────
 
 class Email(Base):
@@ -41,6 +49,10 @@ class Email(Base):
     draft_reply = Column(Text)
     meeting_url = Column(Text)
     sent = Column(Boolean, default=False)
+    triage_rule = Column(String)  # header rule(s) that triaged this email without the LLM
+    triage_confidence = Column(Float)
+    triage_attempts = Column(Integer, default=0)  # failed retriage_pending() runs for this email
+    next_triage_at = Column(DateTime)  # retriage_pending() skips the email until then
 
     def __repr__(self):
         return f"<Email(id={self.id}, subject={self.subject})>"
@@ -91,16 +103,142 @@ class SentEmail(Base):
     def __repr__(self):
         return f"<SentEmail(id={self.id}, recipient={self.recipient})>"
 
+
+class SyncState(Base):
+    """Last Gmail historyId processed for each monitored mailbox."""
+    __tablename__ = "sync_state"
+
+    id = Column(Integer, primary_key=True)
+    mailbox = Column(String, unique=True, nullable=False)
+    history_id = Column(String)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc),
+                        onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<SyncState(mailbox={self.mailbox}, history_id={self.history_id})>"
+
+
+class BackfillState(Base):
+    """Resumable cursor for a full-mailbox backfill."""
+    __tablename__ = "backfill_state"
+
+    id = Column(Integer, primary_key=True)
+    mailbox = Column(String, unique=True, nullable=False)
+    page_token = Column(String)  # next messages.list page to process; NULL = first page
+    pages_done = Column(Integer, default=0)
+    messages_done = Column(Integer, default=0)
+    completed = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc),
+                        onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<BackfillState(mailbox={self.mailbox}, pages_done={self.pages_done})>"
+
+
+class MessageArrival(Base):
+    """Arrival time (Gmail internalDate) of each ingested message, used to estimate mailbox traffic."""
+    __tablename__ = "message_arrivals"
+
+    id = Column(Integer, primary_key=True)
+    mailbox = Column(String, nullable=False, index=True)
+    arrived_at = Column(DateTime, nullable=False, index=True)
+
+
+class PollState(Base):
+    """Current adaptive polling interval and estimated arrival rate per mailbox."""
+    __tablename__ = "poll_state"
+
+    id = Column(Integer, primary_key=True)
+    mailbox = Column(String, unique=True, nullable=False)
+    interval_seconds = Column(Integer)
+    arrival_rate = Column(Float, default=0.0)  # estimated messages per hour
+    empty_polls = Column(Integer, default=0)  # consecutive polls that found nothing
+    last_poll_at = Column(DateTime)
+    next_poll_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<PollState(mailbox={self.mailbox}, interval={self.interval_seconds}s)>"
+
+
+class OutboxMessage(Base):
+    """Outgoing email waiting for (or done with) delivery by the outbox worker."""
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True)
+    mailbox = Column(String, nullable=False)
+    email_id = Column(Integer, ForeignKey("emails.id"), nullable=True)  # set when replying to a stored email
+    to_addr = Column(String, nullable=False)
+    subject = Column(String)
+    body = Column(Text)
+    status = Column(String, default="queued", index=True)  # queued | sending | sent | failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    claimed_at = Column(DateTime)
+    last_error = Column(Text)
+    gmail_message_id = Column(String)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, to={self.to_addr}, status={self.status})>"
+
 # ────────────────────────────── INIT & SESSION ──────────────────────────────────
 
-def init_db() -> None:
-    """Run at startup to ensure all tables exist."""
+def get_engine():
+    """Returns the process-wide engine, creating the data directory and engine on first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                DATA_DIR.mkdir(exist_ok=True)
+                _engine = create_engine(DB_URL, future=True, echo=False)
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def set_engine(new_engine) -> None:
+    """Points the module (and SessionLocal) at another engine, e.g. an in-memory one in tests."""
+    global _engine, _schema_ready
+    with _engine_lock:
+        _engine = new_engine
+        _schema_ready = False
+        SessionLocal.configure(bind=new_engine)
+
+
+def __getattr__(name):
+    # `database.engine` keeps working for callers written before the engine became lazy
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def init_db(force: bool = False) -> None:
+    """Ensures all tables (and any newly added columns) exist; later calls in the same process are no-ops."""
+    global _schema_ready
+    if _schema_ready and not force:
+        return
+    engine = get_engine()
     Base.metadata.create_all(engine)
+    _add_missing_columns(engine)
+    _schema_ready = True
+
+
+def _add_missing_columns(engine) -> None:
+    """create_all never alters existing tables, so add nullable columns introduced since they were created."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
 
 
 @contextmanager
 def session_scope() -> Session:
     """Provide a transactional scope around a series of operations."""
+    get_engine()
     session = SessionLocal()
     try:
         yield session
@@ -125,6 +263,17 @@ def upsert_email(data: dict) -> None:
             row.timestamp = data.get("timestamp", row.timestamp)
 
 
+def existing_gmail_ids(gmail_ids: list[str]) -> set[str]:
+    """Returns the subset of `gmail_ids` already stored, using the unique gmail_id index."""
+    found = set()
+    with session_scope() as db:
+        for start in range(0, len(gmail_ids), 500):  # stay under SQLite's bound-parameter limit
+            chunk = gmail_ids[start:start + 500]
+            rows = db.query(Email.gmail_id).filter(Email.gmail_id.in_(chunk)).all()
+            found.update(row[0] for row in rows)
+    return found
+
+
 def update_draft(gmail_id: str, text: str) -> None:
     with session_scope() as db:
         row = db.query(Email).filter_by(gmail_id=gmail_id).one_or_none()
@@ -161,3 +310,147 @@ def log_sent_email(email_id: int, recipient: str, subject: str, body: str) -> No
     with session_scope() as db:
         db.add(SentEmail(email_id=email_id, recipient=recipient, subject=subject, body=body))
 
+
+def get_history_id(mailbox: str) -> str | None:
+    with session_scope() as db:
+        row = db.query(SyncState).filter_by(mailbox=mailbox).one_or_none()
+        return row.history_id if row else None
+
+
+def save_history_id(mailbox: str, history_id: str) -> None:
+    with session_scope() as db:
+        row = db.query(SyncState).filter_by(mailbox=mailbox).one_or_none()
+        if row is None:
+            db.add(SyncState(mailbox=mailbox, history_id=str(history_id)))
+        else:
+            row.history_id = str(history_id)
+
+
+def get_backfill_state(mailbox: str) -> dict | None:
+    with session_scope() as db:
+        row = db.query(BackfillState).filter_by(mailbox=mailbox).one_or_none()
+        return {c.name: getattr(row, c.name) for c in row.__table__.columns} if row else None
+
+
+def save_backfill_state(mailbox: str, page_token: str | None, pages_done: int,
+                        messages_done: int, completed: bool) -> None:
+    with session_scope() as db:
+        row = db.query(BackfillState).filter_by(mailbox=mailbox).one_or_none()
+        if row is None:
+            row = BackfillState(mailbox=mailbox)
+            db.add(row)
+        row.page_token = page_token
+        row.pages_done = pages_done
+        row.messages_done = messages_done
+        row.completed = completed
+
+
+def reset_backfill_state(mailbox: str) -> None:
+    with session_scope() as db:
+        db.query(BackfillState).filter_by(mailbox=mailbox).delete()
+
+
+def record_arrivals(mailbox: str, arrived_at: list[datetime], keep_since: datetime) -> None:
+    """Stores new arrival timestamps and prunes those older than `keep_since`."""
+    with session_scope() as db:
+        db.add_all(MessageArrival(mailbox=mailbox, arrived_at=ts) for ts in arrived_at)
+        db.query(MessageArrival).filter(
+            MessageArrival.mailbox == mailbox, MessageArrival.arrived_at < keep_since
+        ).delete()
+
+
+def recent_arrivals(mailbox: str, since: datetime) -> list[datetime]:
+    with session_scope() as db:
+        rows = db.query(MessageArrival.arrived_at).filter(
+            MessageArrival.mailbox == mailbox, MessageArrival.arrived_at >= since
+        ).all()
+        return [row[0] for row in rows]
+
+
+def get_poll_state(mailbox: str) -> dict | None:
+    with session_scope() as db:
+        row = db.query(PollState).filter_by(mailbox=mailbox).one_or_none()
+        return {c.name: getattr(row, c.name) for c in row.__table__.columns} if row else None
+
+
+def save_poll_state(mailbox: str, **fields) -> None:
+    with session_scope() as db:
+        row = db.query(PollState).filter_by(mailbox=mailbox).one_or_none()
+        if row is None:
+            row = PollState(mailbox=mailbox)
+            db.add(row)
+        for name, value in fields.items():
+            setattr(row, name, value)
+
+
+def enqueue_outbox(mailbox: str, to_addr: str, subject: str, body: str, email_id: int | None = None) -> int:
+    with session_scope() as db:
+        message = OutboxMessage(mailbox=mailbox, to_addr=to_addr, subject=subject, body=body, email_id=email_id)
+        db.add(message)
+        db.flush()
+        return message.id
+
+
+def claim_outbox_message() -> dict | None:
+    """
+    Marks the oldest due queued message as "sending" and returns it.
+
+    The claim is a conditional UPDATE, so concurrent workers (even in other
+    processes) never pick up the same message.
+    """
+    now = datetime.now(timezone.utc)
+    with session_scope() as db:
+        candidates = db.query(OutboxMessage.id).filter(
+            OutboxMessage.status == "queued", OutboxMessage.next_attempt_at <= now
+        ).order_by(OutboxMessage.next_attempt_at, OutboxMessage.id).limit(5).all()
+        for (message_id,) in candidates:
+            claimed = db.query(OutboxMessage).filter(
+                OutboxMessage.id == message_id, OutboxMessage.status == "queued"
+            ).update({"status": "sending", "claimed_at": now}, synchronize_session=False)
+            if claimed:
+                row = db.get(OutboxMessage, message_id)
+                db.refresh(row)
+                return {c.name: getattr(row, c.name) for c in row.__table__.columns}
+    return None
+
+
+def complete_outbox_message(message_id: int, gmail_message_id: str) -> None:
+    """Records confirmed delivery; only now is the replied-to email marked sent and logged."""
+    with session_scope() as db:
+        message = db.get(OutboxMessage, message_id)
+        message.status = "sent"
+        message.attempts = (message.attempts or 0) + 1
+        message.gmail_message_id = gmail_message_id
+        message.sent_at = datetime.now(timezone.utc)
+        message.last_error = None
+        if message.email_id:
+            email = db.get(Email, message.email_id)
+            if email:
+                email.sent = True
+            db.add(SentEmail(email_id=message.email_id, recipient=message.to_addr,
+                             subject=message.subject, body=message.body))
+
+
+def retry_outbox_message(message_id: int, error: str, next_attempt_at: datetime) -> None:
+    with session_scope() as db:
+        message = db.get(OutboxMessage, message_id)
+        message.status = "queued"
+        message.attempts = (message.attempts or 0) + 1
+        message.last_error = error
+        message.next_attempt_at = next_attempt_at
+
+
+def fail_outbox_message(message_id: int, error: str) -> None:
+    with session_scope() as db:
+        message = db.get(OutboxMessage, message_id)
+        message.status = "failed"
+        message.attempts = (message.attempts or 0) + 1
+        message.last_error = error
+
+
+def requeue_stale_outbox(claimed_before: datetime) -> int:
+    """Returns messages stuck in "sending" (worker died mid-send) to the queue."""
+    with session_scope() as db:
+        return db.query(OutboxMessage).filter(
+            OutboxMessage.status == "sending", OutboxMessage.claimed_at < claimed_before
+        ).update({"status": "queued"}, synchronize_session=False)
@@ -2,23 +2,16 @@ import os
 import logging
 import json
 import re
-from langchain_groq import ChatGroq
+from core import llm_registry, metrics, model_cascade
+from core.data_models import is_valid_triage
+from core.text_reducer import reduce_for_prompt
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Model & Auth
-# MODEL_NAME = os.getenv("CLASSIFIER_MODEL", "llama-3.1-8b-instant")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-# Initialize Groq client
-llm = ChatGroq(
-    api_key=GROQ_API_KEY,
-    model_name = "mixtral-8x7b-32768"
-)
-
-TRIAGE_PROMPT_TEMPLATE = """
+# Shared by the single-email and batch prompts: the label/subtype guide with its few-shot examples
+TRIAGE_INSTRUCTIONS = """
 You are an advanced executive assistant trained to triage incoming emails with perfect accuracy.
 
 Your responsibilities are:
@@ -184,15 +177,17 @@ Edit
 - Skip this field if no specific time is mentioned.
 
 ---
+"""
 
+TRIAGE_PROMPT_TEMPLATE = TRIAGE_INSTRUCTIONS + """
 🎯 OUTPUT FORMAT:
 
 Respond ONLY with this valid JSON block:
-{
+{{
   "label": "<email | notify | no>",
   "subtype": "<exact_subtype>",
   "due_time": "..." // optional
-}
+}}
 
 ❌ Do NOT explain your answer.  
 ❌ Do NOT use markdown or return summaries.  
@@ -209,29 +204,179 @@ Respond ONLY with this valid JSON block:
 """
 
 
-def classify_email(email_body: str) -> dict:
-    """Returns classification label, subtype, and metadata as a dict."""
+DEFAULT_TRIAGE = {"label": "notify", "subtype": "UPCOMING_EVENT"}
+
+# Emails packed into one batch request, and the most (reduced) input tokens per batch
+TRIAGE_BATCH_SIZE = int(os.getenv("TRIAGE_BATCH_SIZE", "8"))
+TRIAGE_BATCH_MAX_TOKENS = int(os.getenv("TRIAGE_BATCH_MAX_TOKENS", "6000"))
+
+BATCH_OUTPUT_FORMAT = """
+🎯 OUTPUT FORMAT:
+
+You are given several emails, each with an "id". Triage every one of them independently.
+Respond ONLY with this valid JSON object, with exactly one entry per id, using the ids as given:
+{
+  "results": [
+    {"id": "<id>", "label": "<email | notify | no>", "subtype": "<exact_subtype>", "due_time": "..."}
+  ]
+}
+Leave out "due_time" when no specific time is mentioned.
+
+❌ Do NOT explain your answers.
+❌ Do NOT use markdown or return summaries.
+✅ Only return the JSON object.
+
+---
+
+📩 EMAILS TO TRIAGE:
+"""
+
+
+def _parse_triage(data: dict) -> dict | None:
+    """Normalizes one triage object; None if the label/subtype pair is not a valid one."""
+    label = (data.get("label") or "").lower()
+    subtype = (data.get("subtype") or "").upper()
+    if not is_valid_triage(label, subtype):
+        return None
+    return {"label": label, "subtype": subtype, "due_time": data.get("due_time") or data.get("meeting_time")}
+
+
+def _parse_single(raw_response: str) -> dict | None:
+    match = re.search(r"\{.*\}", raw_response, re.DOTALL)
     try:
-        if not email_body.strip():
-            return {"label": "notify", "subtype": "UPCOMING_EVENT"}
+        return _parse_triage(json.loads(match.group(0))) if match else None
+    except ValueError:
+        return None
 
-        input_prompt = TRIAGE_PROMPT_TEMPLATE.format(email_content=email_body)
 
-        response = llm.invoke([{"role": "user", "content": input_prompt}])
-        raw_response = response.content.strip()
+def _classify_one(email_body: str) -> dict | None:
+    """Single-email triage call; None when the model fails or returns no valid triage."""
+    if not email_body.strip():
+        return dict(DEFAULT_TRIAGE)
+    try:
+        reduced = reduce_for_prompt(email_body)
+        logger.info(f"Triage input reduced from ~{reduced.tokens_before} to ~{reduced.tokens_after} tokens")
+
+        messages = [{"role": "user", "content": TRIAGE_PROMPT_TEMPLATE.format(email_content=reduced.text)}]
 
-        match = re.search(r"\{.*\}", raw_response, re.DOTALL)
-        if match:
-            data = json.loads(match.group(0))
-            return {
-                "label": data.get("label", "notify").lower(),
-                "subtype": data.get("subtype", "UPCOMING_EVENT").upper(),
-                "due_time": data.get("due_time") or data.get("meeting_time")
-            }
+        if model_cascade.ENABLED:
+            return model_cascade.run(
+                [0], lambda keys: messages,
+                lambda text, keys: {0: triage} if (triage := _parse_single(text)) else {},
+            ).get(0)
+
+        response = llm_registry.invoke("triage", messages)
+        raw_response = response.content.strip()
 
-        logger.warning(f"⚠️ Unexpected format: {raw_response}")
-        return {"label": "notify", "subtype": "UPCOMING_EVENT"}
+        triage = _parse_single(raw_response)
+        if triage is None:
+            logger.warning(f"⚠️ Unexpected format: {raw_response}")
+        return triage
 
     except Exception as e:
         logger.error(f"❌ Error in classify_email: {e}")
-        return {"label": "notify", "subtype": "UPCOMING_EVENT"}
+        return None
+
+
+def classify_email(email_body: str) -> dict:
+    """Returns classification label, subtype, and metadata as a dict."""
+    return _classify_one(email_body) or dict(DEFAULT_TRIAGE)
+
+
+def _batches(texts: list[str]):
+    """Groups (index, reduced text) pairs by TRIAGE_BATCH_SIZE and TRIAGE_BATCH_MAX_TOKENS."""
+    batch, tokens = [], 0
+    for index, text in enumerate(texts):
+        reduced = reduce_for_prompt(text)
+        if batch and (len(batch) >= TRIAGE_BATCH_SIZE or tokens + reduced.tokens_after > TRIAGE_BATCH_MAX_TOKENS):
+            yield batch
+            batch, tokens = [], 0
+        batch.append((index, reduced.text))
+        tokens += reduced.tokens_after
+    if batch:
+        yield batch
+
+
+def _batch_messages(texts: dict, ids: list, instructions: str = TRIAGE_INSTRUCTIONS) -> list:
+    emails = "\n".join(json.dumps({"id": email_id, "email": texts[email_id]}, ensure_ascii=False) for email_id in ids)
+    return [{"role": "user", "content": instructions + BATCH_OUTPUT_FORMAT + emails + "\n\n📤 FINAL ANSWER:\n"}]
+
+
+def _parse_batch(raw_response: str, ids: list) -> dict:
+    """
+    {id: triage} for the ids that came back exactly once with a valid triage;
+    unknown or duplicated ids are dropped. Raises if there is no results array.
+    """
+    results = json.loads(raw_response).get("results")
+    if not isinstance(results, list):
+        raise ValueError("batch triage response has no results array")
+
+    seen, triaged = set(), {}
+    for entry in results:
+        entry_id = str(entry.get("id")) if isinstance(entry, dict) else None
+        if entry_id not in ids or entry_id in seen:
+            logger.warning(f"⚠️ Batch triage returned unexpected id {entry_id!r}")
+            triaged.pop(entry_id, None)
+            continue
+        seen.add(entry_id)
+        triage = _parse_triage(entry)
+        if triage is not None:
+            triaged[entry_id] = triage
+    return triaged
+
+
+def _classify_batch_call(batch, role="triage", instructions=TRIAGE_INSTRUCTIONS) -> dict:
+    """One request (or one cascade) for the whole batch; returns {index: triage} for the emails it answered."""
+    texts = {f"e{index}": text for index, text in batch}
+    ids = list(texts)
+    json_mode = {"response_format": {"type": "json_object"}}
+
+    if model_cascade.ENABLED:
+        triaged = model_cascade.run(
+            ids, lambda subset: _batch_messages(texts, subset, instructions), _parse_batch, label=role, **json_mode
+        )
+    else:
+        response = llm_registry.invoke(role, _batch_messages(texts, ids, instructions), **json_mode)
+        triaged = _parse_batch(response.content, ids)
+    return {int(email_id[1:]): triage for email_id, triage in triaged.items()}
+
+
+def classify_emails_batch(email_bodies: list[str], role="triage", instructions=TRIAGE_INSTRUCTIONS,
+                          classify_one=_classify_one) -> list[dict | None]:
+    """
+    Triages many emails with one LLM request per batch (the instructions and
+    examples are sent once per batch instead of once per email).
+
+    Returns one triage dict per input, in order. Emails the batch answer did not
+    cover, or every email of a batch whose answer could not be parsed, are retried
+    with `classify_one`; None marks an email that could not be triaged at all.
+    `role` and `instructions` let another caller batch its own model and prompt.
+    """
+    results = [None] * len(email_bodies)
+    pending = []
+    for index, body in enumerate(email_bodies):
+        if body.strip():
+            pending.append(index)
+        else:
+            results[index] = dict(DEFAULT_TRIAGE)
+
+    for batch in _batches([email_bodies[index] for index in pending]):
+        batch = [(pending[position], text) for position, text in batch]
+        if len(batch) == 1:
+            index = batch[0][0]
+            results[index] = classify_one(email_bodies[index])
+            continue
+        try:
+            triaged = _classify_batch_call(batch, role, instructions)
+        except Exception as e:
+            logger.warning(f"⚠️ Batch triage of {len(batch)} emails failed ({e}) → classifying one by one")
+            triaged = {}
+        metrics.incr("triage.batch.requests")
+        metrics.incr("triage.batch.emails", len(triaged))
+        for index, _ in batch:
+            if index in triaged:
+                results[index] = triaged[index]
+            else:
+                metrics.incr("triage.batch.fallbacks")
+                results[index] = classify_one(email_bodies[index])
+    return results
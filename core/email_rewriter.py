@@ -1,10 +1,9 @@
 # core/email_rewriter.py
 
-import ollama
 import asyncio
 import os
 import logging
-from langchain_groq import ChatGroq
+from core import llm_registry
 from concurrent.futures import ThreadPoolExecutor
 
 
@@ -12,32 +11,13 @@ from concurrent.futures import ThreadPoolExecutor
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Model Config
-MODEL_NAME = os.getenv("REWRITER_MODEL", "mistral-saba-24b")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-llm = ChatGroq(
-    api_key=GROQ_API_KEY,
-    model_name=MODEL_NAME,
-)
-
-def sync_generate(prompt: str) -> str:
-    response = llm.invoke([{"role": "user", "content": prompt}])
+def sync_generate(prompt: str, use_cache: bool = True) -> str:
+    response = llm_registry.invoke("rewriter", [{"role": "user", "content": prompt}], use_cache=use_cache)
     return response.content.strip()
 
 
-async def rewrite_email(draft_text: str, tone: str = "polite and professional") -> str:
-    """
-    Rewrite the given email draft into the specified tone.
-
-    Args:
-        draft_text (str): The original AI-generated draft email.
-        tone (str): Desired tone for rewriting (e.g., formal, casual, assertive).
-
-    Returns:
-        str: The rewritten email.
-    """
-    prompt = f"""
+def build_rewrite_prompt(draft_text: str, tone: str) -> str:
+    return f"""
     You are an expert email assistant and communication specialist.
 
     Your task is to rewrite the following email draft to reflect the tone: **"{tone}"**.
@@ -65,15 +45,37 @@ async def rewrite_email(draft_text: str, tone: str = "polite and professional")
     Now rewrite this to reflect the **"{tone}"** tone:
     """
 
+
+async def rewrite_email(draft_text: str, tone: str = "polite and professional", use_cache: bool = True) -> str:
+    """
+    Rewrite the given email draft into the specified tone.
+
+    Args:
+        draft_text (str): The original AI-generated draft email.
+        tone (str): Desired tone for rewriting (e.g., formal, casual, assertive).
+        use_cache (bool): Reuse a cached rewrite of the same draft and tone if one exists.
+
+    Returns:
+        str: The rewritten email.
+    """
+    prompt = build_rewrite_prompt(draft_text, tone)
+
     try:
         logger.info(f"Rewriting email in tone: {tone}")
         loop = asyncio.get_running_loop()
-        rewritten_text = await loop.run_in_executor(ThreadPoolExecutor(), sync_generate, prompt)
+        rewritten_text = await loop.run_in_executor(ThreadPoolExecutor(), sync_generate, prompt, use_cache)
         return rewritten_text
     except Exception as e:
         logger.error(f"Failed to rewrite email: {e}")
         raise RuntimeError("Email rewriting failed.")
 
+def stream_rewrite(draft_text: str, tone: str = "polite and professional", use_cache: bool = True):
+    """Yields the rewritten draft in pieces as the model generates it (same prompt and cache as rewrite_email)."""
+    logger.info(f"Streaming rewrite in tone: {tone}")
+    messages = [{"role": "user", "content": build_rewrite_prompt(draft_text, tone)}]
+    yield from llm_registry.stream("rewriter", messages, use_cache=use_cache)
+
+
 # For manual testing (optional)
 if __name__ == "__main__":
     import asyncio
@@ -1,67 +1,58 @@
 import os
 import json
 import base64
+import codecs
 import re
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from googleapiclient.errors import HttpError
 from email.mime.text import MIMEText
-import ollama  # Local LLM models (Mistral for summarization, LLaMA for classification)
-from langchain_groq import ChatGroq
-
-# 🔧 Constants for storage
-SECRETS_DIR = os.path.join(os.path.dirname(__file__), "../.secrets")
-SECRETS_FILE = os.path.join(SECRETS_DIR, "client_secret.json")
-TOKEN_FILE = os.path.join(SECRETS_DIR, "token.json")
-SETTINGS_FILE = os.path.join(SECRETS_DIR, "settings.json")
-
-SCOPES = [
-    "https://www.googleapis.com/auth/gmail.modify",
-    "https://www.googleapis.com/auth/calendar",
-]
-
-# 🔧 Ollama client config
-summarizer_llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    model_name="llama-3.3-70b-versatile",  # 🧠 High-context summarizer
-    temperature=0.3,
-    max_tokens=32768
-)
-
-
-classifier_llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    model_name=os.getenv("CLASSIFIER_MODEL", "llama-3.1-8b-instant")
-)
-
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, "r") as file:
-            return json.load(file)
-    return {}
-
-def save_settings(settings):
-    with open(SETTINGS_FILE, "w") as file:
-        json.dump(settings, file, indent=4)
+from core import llm_registry
+from core import metrics
+from core import model_cascade
+from core.metrics import get as get_metric
+from core.text_reducer import estimate_tokens, reduce_for_prompt, split_into_chunks
+from core.data_models import is_valid_triage
+
+from core import google_clients
+from core.google_clients import SECRETS_DIR, SCOPES, TOKEN_FILE
+
+from core.settings_store import SETTINGS_FILE, load_settings, save_settings
+
+SUMMARY_ERROR = "Error summarizing email content."
+
+# Opt-in: one structured-output call per email instead of summarize + classify
+COMBINED_TRIAGE = os.getenv("COMBINED_TRIAGE", "").lower() in ("1", "true", "yes")
+
+# Tokens of summarizer prompt around the email text itself
+SUMMARY_PROMPT_OVERHEAD = 400
+
+
+def _single_call_limit():
+    """Longest (reduced) body one summarizer call can take within its context window and per-minute token budget."""
+    config = llm_registry.get_config("summarizer")
+    by_context = config.context_window - (config.max_tokens or 0)
+    by_budget = config.tokens_per_minute - llm_registry.COMPLETION_ESTIMATE
+    return min(by_context, by_budget) - SUMMARY_PROMPT_OVERHEAD
+
+
+# Bodies longer than this (after reduction) are summarized chunk by chunk, then merged
+LONG_EMAIL_TOKENS = int(os.getenv("SUMMARY_CHUNK_THRESHOLD_TOKENS") or _single_call_limit())
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "2500"))
+SUMMARY_CHUNK_CONCURRENCY = int(os.getenv("SUMMARY_CHUNK_CONCURRENCY", "4"))
+
+def _mailbox():
+    return load_settings().get("monitored_email") or "me"
 
 def get_credentials():
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(SECRETS_FILE, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(TOKEN_FILE, "w") as token:
-            token.write(creds.to_json())
-    return creds
+    return google_clients.get_credentials(_mailbox())
 
 def get_gmail_service():
-    creds = get_credentials()
-    return build("gmail", "v1", credentials=creds, cache_discovery=False)
+    return google_clients.get_service("gmail", "v1", _mailbox())
+
+def get_calendar_service():
+    return google_clients.get_service("calendar", "v3", _mailbox())
 
 def set_monitored_email(email):
     settings = load_settings()
@@ -71,6 +62,7 @@ def set_monitored_email(email):
         save_settings(settings)
         if os.path.exists(TOKEN_FILE):
             os.remove(TOKEN_FILE)
+        google_clients.invalidate()
         get_credentials()
 
 def extract_email_address(from_field):
@@ -81,6 +73,15 @@ def summarize_email_content(html_content):
     if not html_content:
         return "No content available."
 
+    reduced = reduce_for_prompt(html_content)
+    print(f"✂️ Summarizer input reduced from ~{reduced.tokens_before} to ~{reduced.tokens_after} tokens")
+    if reduced.tokens_after > LONG_EMAIL_TOKENS:
+        return summarize_long_text(reduced.text)
+    return _summarize_text(reduced.text)
+
+
+def _summarize_text(text, part_summaries=False):
+    source = "Partial summaries of consecutive parts of one long email" if part_summaries else "Email Content"
     prompt = f"""
     You are an AI email assistant.
 
@@ -99,42 +100,125 @@ def summarize_email_content(html_content):
     - Group similar content together.
     - Minimum 5, ideally 7–10 distinct bullet points.
 
-    Email Content:
-    {html_content}
+    {source}:
+    {text}
 
     ---
 
     Return only the summary as clean, readable bullet points.
     """
     try:
-        response = summarizer_llm.invoke([{"role": "user", "content": prompt}])
+        response = llm_registry.invoke("summarizer", [{"role": "user", "content": prompt}])
         return response.content.strip()
     except Exception as e:
         print(f"❌ Mistral Summarization Error: {e}")
-        return "Error summarizing email content."
+        return SUMMARY_ERROR
 
 
-def classify_email_with_llama3(summarized_content):
-    if not summarized_content:
-        return {"label": "notify", "subtype": "UPCOMING_EVENT"}
-
+def _summarize_chunk(chunk, index, total):
     prompt = f"""
+    You are summarizing part {index} of {total} of one long email or thread.
+    List every request, question, decision, date, deadline, amount, name and link in this part
+    as short bullet points. Do not add an introduction or conclusion.
+
+    Part {index} of {total}:
+    {chunk}
+    """
+    response = llm_registry.invoke("chunk_summarizer", [{"role": "user", "content": prompt}])
+    return response.content.strip()
+
+
+MIN_CHUNK_TOKENS = 500
+
+
+def _chunk_plan():
+    """
+    (chunk size, parallel chunk calls) that fit the chunk model's per-minute token
+    budget, so a full wave of map calls starts at once instead of queueing in the
+    shared rate limiter. Raise LLM_CHUNK_SUMMARIZER_TOKENS_PER_MINUTE to your Groq
+    tier's limit for faster long-email summaries.
+    """
+    config = llm_registry.get_config("chunk_summarizer")
+    completion = min(config.max_tokens or llm_registry.COMPLETION_ESTIMATE, llm_registry.COMPLETION_ESTIMATE)
+    per_call_budget = config.tokens_per_minute // max(SUMMARY_CHUNK_CONCURRENCY, 1) - completion
+    chunk_tokens = max(MIN_CHUNK_TOKENS, min(SUMMARY_CHUNK_TOKENS, per_call_budget))
+    workers = max(1, min(SUMMARY_CHUNK_CONCURRENCY, config.tokens_per_minute // (chunk_tokens + completion)))
+    return chunk_tokens, workers
+
+
+def summarize_long_text(text, max_rounds=3):
+    """
+    Map-reduce summary for text too long for one prompt.
+
+    Splits on paragraph boundaries into chunks sized by _chunk_plan(), summarizes
+    them in parallel with the small chunk model, and repeats on the joined
+    partial summaries until they fit under LONG_EMAIL_TOKENS; the final merge
+    uses the regular summarizer prompt. Any failed chunk fails the whole
+    summary (SUMMARY_ERROR) rather than silently dropping part of the email.
+    """
+    chunk_tokens, workers = _chunk_plan()
+    for _ in range(max_rounds):
+        chunks = split_into_chunks(text, chunk_tokens)
+        print(f"🧩 Summarizing ~{estimate_tokens(text)} tokens in {len(chunks)} chunks")
+        metrics.incr("summarizer.chunked")
+        metrics.incr("summarizer.chunks", len(chunks))
+        try:
+            with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+                partials = list(executor.map(_summarize_chunk, chunks, range(1, len(chunks) + 1),
+                                             [len(chunks)] * len(chunks)))
+        except Exception as e:
+            print(f"❌ Chunk Summarization Error: {e}")
+            return SUMMARY_ERROR
+        text = "\n\n".join(f"Part {i}:\n{partial}" for i, partial in enumerate(partials, 1))
+        if estimate_tokens(text) <= LONG_EMAIL_TOKENS:
+            break
+    return _summarize_text(text, part_summaries=True)
+
+
+def _parse_classification(raw):
+    match = re.search(r"\{.*?\}", raw, re.DOTALL)
+    if match:
+        data = json.loads(match.group(0))
+        label = (data.get("label") or "").lower()
+        if label in ("email", "notify", "no"):
+            return {
+                "label": label,
+                "subtype": (data.get("subtype") or "UPCOMING_EVENT").upper(),
+                "due_time": data.get("due_time")
+            }
+    return None
+
+
+def _parse_cascade_classification(raw, keys):
+    """Stricter than the plain path: the small model's answer must carry a valid subtype, or it is escalated."""
+    try:
+        triage = _parse_classification(raw)
+    except ValueError:
+        return {}
+    return {0: triage} if triage and is_valid_triage(triage["label"], triage["subtype"]) else {}
+
+
+CLASSIFIER_TASK = """
 You are a highly accurate AI email triage assistant. Your job is to:
 
 1. Determine if the email requires a reply, is just a notification, or should be ignored.
 2. Pick the appropriate subtype from a fixed list.
 3. Detect any clear deadlines, due dates, or times — and return them in ISO format if found.
 4. Respond ONLY in valid JSON.
+"""
 
+CLASSIFIER_OUTPUT_FORMAT = """
 ---
 
 Your response must strictly follow this format:
-{{
+{
   "label": "email" | "notify" | "no",
   "subtype": "<see subtype options>",
   "due_time": "YYYY-MM-DDTHH:MM:SSZ"  // only if a clear deadline is found
-}}
+}
+"""
 
+CLASSIFIER_SUBTYPES = """
 ---
 
 Subtype values:
@@ -156,7 +240,17 @@ no:
 - SPAM
 - PROMOTION
 - SOCIAL
+"""
+
+# The classifier prompt without its single-answer format, for batched requests
+CLASSIFIER_INSTRUCTIONS = CLASSIFIER_TASK + CLASSIFIER_SUBTYPES + "\n---\n"
+
+
+def classify_email_with_llama3(summarized_content):
+    if not summarized_content:
+        return {"label": "notify", "subtype": "UPCOMING_EVENT"}
 
+    prompt = CLASSIFIER_TASK + CLASSIFIER_OUTPUT_FORMAT + CLASSIFIER_SUBTYPES + f"""
 ---
 
 Summarized Email:
@@ -167,33 +261,479 @@ Summarized Email:
 Final JSON:
 """
 
+    messages = [{"role": "user", "content": prompt}]
     try:
-        response = classifier_llm.invoke([{"role": "user", "content": prompt}])
+        if model_cascade.ENABLED:
+            return model_cascade.run([0], lambda keys: messages, _parse_cascade_classification, label="classifier").get(0)
+
+        response = llm_registry.invoke("classifier", messages)
         raw = response.content.strip()
 
-        match = re.search(r"\{.*?\}", raw, re.DOTALL)
-        if match:
-            data = json.loads(match.group(0))
-            return {
-                "label": data.get("label", "notify").lower(),
-                "subtype": data.get("subtype", "UPCOMING_EVENT").upper(),
-                "due_time": data.get("due_time")
-            }
-        else:
-            return {"label": "notify", "subtype": "UPCOMING_EVENT", "due_time": None}
+        triage = _parse_classification(raw)
+        if triage:
+            return triage
+        print(f"⚠️ LLaMA Classification returned no usable label: {raw[:200]}")
+        return None
 
     except Exception as e:
+        # None, not a guessed "notify": the email is stored untriaged and retried by retriage_pending()
         print(f"❌ LLaMA Classification Error: {e}")
-        return {"label": "notify", "subtype": "UPCOMING_EVENT", "due_time": None}
+        return None
+
 
 
+def summarize_and_classify(html_content):
+    """
+    Summarizes and triages an email in a single JSON-mode call.
+
+    Returns (summary, {"label", "subtype", "due_time"}) in the same shape as
+    summarize_email_content + classify_email_with_llama3, and falls back to
+    those two calls if the combined response is not valid. Long emails go
+    straight to the chunked summary followed by a separate classify call.
+    """
+    if not html_content:
+        return "No content available.", {"label": "notify", "subtype": "UPCOMING_EVENT", "due_time": None}
+
+    reduced = reduce_for_prompt(html_content)
+    if reduced.tokens_after > LONG_EMAIL_TOKENS:
+        summary = summarize_long_text(reduced.text)
+        return summary, (classify_email_with_llama3(summary) if summary != SUMMARY_ERROR else None)
+    prompt = f"""
+You are an AI email assistant. Read the email below and return ONE JSON object with:
+
+- "summary": the email summarized as 5–10 clear bullet points (one string, bullets separated by newlines).
+  Highlight requests, links, meeting details, deadlines and questions; ignore styling, footers and promotions.
+- "label": "email" if a reply or action is expected, "notify" if it is informational, "no" for spam/marketing/social.
+- "subtype": exactly one of
+    email: INFO_REQUEST, QUOTE_PROPOSAL, SUPPORT_ISSUE, FEEDBACK_COMPLAINT, MEETING_INVITE, SCHEDULE_REQUEST, DEADLINE_TASK
+    notify: RESULT, UPCOMING_EVENT, ALERT
+    no: SPAM, PROMOTION, SOCIAL
+- "due_time": "YYYY-MM-DDTHH:MM:SSZ" only if a clear deadline or due time is stated, otherwise null.
+
+Email Content:
+\"\"\"
+{reduced.text}
+\"\"\"
+"""
+    try:
+        response = llm_registry.invoke(
+            "summarizer", [{"role": "user", "content": prompt}], response_format={"type": "json_object"}
+        )
+        data = json.loads(response.content)
+        summary = (data.get("summary") or "").strip()
+        label = (data.get("label") or "").lower()
+        subtype = (data.get("subtype") or "").upper()
+        if summary and is_valid_triage(label, subtype):
+            return summary, {"label": label, "subtype": subtype, "due_time": data.get("due_time")}
+        print("⚠️ Combined triage returned an invalid result → falling back to separate calls")
+    except Exception as e:
+        print(f"❌ Combined Summarize/Triage Error: {e}")
+
+    summary = summarize_email_content(html_content)
+    return summary, (classify_email_with_llama3(summary) if summary != SUMMARY_ERROR else None)
+
 
 from core.database import Email, session_scope  # 🔥 Import at the top of the file
 
 from core.database import Email, session_scope  # already imported
+from core.database import existing_gmail_ids, get_history_id, save_history_id
+from core.database import get_backfill_state, save_backfill_state, reset_backfill_state
+from sqlalchemy import func, or_
+from core.ingest_pipeline import IngestPipeline
+from core.email_classifier import TRIAGE_BATCH_SIZE, classify_emails_batch
+from core import local_triage, triage_cache
+from core.header_rules import confident_match
+
+# Classify several summaries per LLM request (TRIAGE_BATCH_SIZE=1 turns batching off)
+BATCH_TRIAGE = TRIAGE_BATCH_SIZE > 1
+
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))  # Gmail allows up to 100 calls per batch
+
+
+def batch_get_messages(service, message_ids, batch_size=GMAIL_BATCH_SIZE):
+    """
+    Fetches full message resources through the Gmail batch HTTP endpoint.
 
-def fetch_emails():
-    creds = get_credentials()
+    One HTTPS round trip per `batch_size` ids instead of one per message.
+    Returns a dict of gmail id -> message resource; ids that fail inside a
+    batch (e.g. per-call rate limiting) are retried once with a plain get.
+    """
+    results = {}
+    failed = []
+
+    def _collect(request_id, response, exception):
+        if exception is not None:
+            failed.append(request_id)
+        else:
+            results[request_id] = response
+
+    for start in range(0, len(message_ids), batch_size):
+        batch = service.new_batch_http_request(callback=_collect)
+        for msg_id in message_ids[start:start + batch_size]:
+            batch.add(service.users().messages().get(userId="me", id=msg_id), request_id=msg_id)
+        batch.execute()
+
+    for msg_id in failed:
+        try:
+            results[msg_id] = service.users().messages().get(userId="me", id=msg_id).execute()
+        except Exception as e:
+            print(f"❌ Error fetching message {msg_id}: {e}")
+
+    return results
+
+
+BODY_MAX_BYTES = int(os.getenv("EMAIL_BODY_MAX_BYTES", str(256 * 1024)))
+_DECODE_CHUNK = 64 * 1024  # base64 characters per decode step; must stay a multiple of 4
+
+
+def decode_body_data(data, max_bytes=BODY_MAX_BYTES):
+    """
+    Decodes base64url body data in chunks and stops once `max_bytes` have been produced.
+
+    Bodies larger than the cap are truncated without decoding the remainder.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    decoded = []
+    produced = 0
+
+    for start in range(0, len(data), _DECODE_CHUNK):
+        chunk = data[start:start + _DECODE_CHUNK]
+        chunk += "=" * (-len(chunk) % 4)  # Gmail may strip padding from the final chunk
+        raw = base64.urlsafe_b64decode(chunk)[:max_bytes - produced]
+        produced += len(raw)
+        decoded.append(decoder.decode(raw))
+        if produced >= max_bytes:
+            break
+
+    decoded.append(decoder.decode(b"", final=True))
+    return "".join(decoded)
+
+
+def walk_payload(payload, max_bytes=BODY_MAX_BYTES):
+    """
+    Walks a Gmail message payload depth-first and returns (text_body, html_body).
+
+    Recurses through nested multipart/* and message/rfc822 parts, decodes only the
+    first text/plain and text/html parts it finds, and skips attachments
+    (parts with a filename or attachmentId) without decoding them.
+    """
+    bodies = {}
+
+    def visit(part):
+        if "text/plain" in bodies and "text/html" in bodies:
+            return
+        body = part.get("body", {})
+        if part.get("filename") or body.get("attachmentId"):
+            return
+        if part.get("parts"):
+            for child in part["parts"]:
+                visit(child)
+            return
+
+        mime_type = (part.get("mimeType") or "text/plain").lower()
+        if mime_type in ("text/plain", "text/html") and mime_type not in bodies and body.get("data"):
+            bodies[mime_type] = decode_body_data(body["data"], max_bytes).strip()
+
+    visit(payload)
+    return bodies.get("text/plain", ""), bodies.get("text/html", "")
+
+
+def parse_message(msg_data):
+    """Extracts sender, subject and body from a Gmail message resource."""
+    payload = msg_data.get("payload", {})
+    headers = payload.get("headers", [])
+
+    from_field = next((h["value"] for h in headers if h["name"].lower() in ["from", "reply-to", "sender"]), "Unknown Sender")
+    sender = extract_email_address(from_field)
+    subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), "No Subject")
+
+    text_body, html_body = walk_payload(payload)
+    if not html_body and text_body:
+        html_body = f"<p>{text_body}</p>"
+
+    return {
+        "gmail_id": msg_data["id"],
+        "sender": sender,
+        "subject": subject,
+        "html_body": html_body,
+        "headers": {h["name"]: h["value"] for h in headers},
+        "label_ids": msg_data.get("labelIds", []),
+        "received_at": datetime.fromtimestamp(int(msg_data["internalDate"]) / 1000, tz=timezone.utc)
+        if msg_data.get("internalDate") else None,
+    }
+
+
+def store_email(item, monitored_email):
+    """Inserts a summarized and triaged message (skipped if already stored) and returns its record."""
+    summarized_content = item["summary"]
+    triage_data = item["triage"]
+    label = triage_data["label"]
+    subtype = triage_data["subtype"]
+
+    # ✅ INSERT INTO DATABASE (skip if already exists)
+    with session_scope() as db:
+        exists = db.query(Email).filter_by(gmail_id=item["gmail_id"]).first()
+        if not exists:
+            email_record = Email(
+                gmail_id=item["gmail_id"],
+                from_addr=item["sender"],
+                to_addr=monitored_email,
+                subject=item["subject"],
+                snippet=summarized_content[:150],
+                body=item["html_body"],
+                triage_label=label,
+                triage_subtype=subtype,
+                triage_rule=item.get("triage_rule"),
+                triage_confidence=item.get("triage_confidence"),
+                draft_reply=json.dumps({"due_time": triage_data.get("due_time")}) if triage_data.get(
+                    "due_time") else None
+            )
+
+            db.add(email_record)
+            print(f"✅ Inserted email '{item['subject']}'")
+        else:
+            print(f"⚠️ Email '{item['subject']}' already in DB → skipping")
+
+    return {
+        "from_email": item["sender"],
+        "subject": item["subject"],
+        "classification": label,
+        "subtype": subtype,
+        "due_time": triage_data.get("due_time"),
+        "summary": summarized_content,
+        "html_content": item["html_body"],
+        "received_at": item["received_at"].isoformat() if item.get("received_at") else None,
+    }
+
+
+def _triage_cache_model():
+    if COMBINED_TRIAGE:
+        return f"{llm_registry.model_name('summarizer')}+combined"
+    return f"{llm_registry.model_name('summarizer')}+{llm_registry.model_name('classifier')}"
+
+
+def summarize_item(item):
+    """
+    Summarize stage. Obvious bulk mail is triaged from its headers, and emails the
+    local model is confident about by that model, without any LLM call; otherwise
+    the cached summary and triage of identical content is reused when available.
+    In COMBINED_TRIAGE mode the triage comes from the same call.
+    """
+    rule_match = confident_match(item["headers"], item["label_ids"], item["sender"])
+    if rule_match:
+        item["skip_llm"] = True
+        item["triage_rule"] = rule_match.rule
+        item["triage_confidence"] = rule_match.confidence
+        item["precomputed_triage"] = {"label": rule_match.label, "subtype": rule_match.subtype, "due_time": None}
+        print(f"⚡ '{item['subject']}' triaged by header rule {rule_match.rule} ({rule_match.confidence:.2f})")
+        return reduce_for_prompt(item["html_body"]).text[:500]
+
+    prediction = local_triage.confident_prediction(item["subject"], item["sender"], item["html_body"])
+    if prediction:
+        item["skip_llm"] = True
+        item["triage_rule"] = local_triage.RULE
+        item["triage_confidence"] = prediction.confidence
+        item["precomputed_triage"] = {"label": prediction.label, "subtype": prediction.subtype, "due_time": None}
+        print(f"⚡ '{item['subject']}' triaged by the local model ({prediction.confidence:.2f})")
+        return reduce_for_prompt(item["html_body"]).text[:500]
+
+    cached = triage_cache.lookup(item["html_body"], _triage_cache_model())
+    if cached:
+        item["skip_llm"] = True
+        item["precomputed_triage"] = cached["triage"]
+        return cached["summary"]
+    if COMBINED_TRIAGE:
+        summary, item["precomputed_triage"] = summarize_and_classify(item["html_body"])
+        return summary
+    return summarize_email_content(item["html_body"])
+
+
+PENDING_TRIAGE = {"label": None, "subtype": None, "due_time": None}
+
+
+def _finish_triage(item, triage_data):
+    if triage_data is None:
+        return dict(PENDING_TRIAGE)
+    triage_cache.store(item["html_body"], _triage_cache_model(), item["summary"], triage_data)
+    return triage_data
+
+
+def classify_item(item):
+    """
+    Classify stage: skips the LLM when the summarize stage already triaged, caches
+    fresh results. If summarizing or classifying failed, the email is stored with
+    no label (PENDING_TRIAGE) for retriage_pending() rather than a guessed one.
+    """
+    if item.get("skip_llm"):
+        return item["precomputed_triage"]
+    if item["summary"] == SUMMARY_ERROR:
+        return dict(PENDING_TRIAGE)
+    return _finish_triage(item, item.get("precomputed_triage") or classify_email_with_llama3(item["summary"]))
+
+
+def _needs_classifier(item):
+    return not item.get("skip_llm") and item["summary"] != SUMMARY_ERROR and not item.get("precomputed_triage")
+
+
+def classify_summaries(summaries):
+    """classify_email_with_llama3() for many summaries, several per request on the same classifier model."""
+    return classify_emails_batch(summaries, role="classifier", instructions=CLASSIFIER_INSTRUCTIONS,
+                                 classify_one=classify_email_with_llama3)
+
+
+def classify_items(items):
+    """Batched classify stage: the emails that still need an LLM triage share classify_summaries() requests."""
+    needs_llm = [item for item in items if _needs_classifier(item)]
+    triaged = dict(zip(map(id, needs_llm), classify_summaries([item["summary"] for item in needs_llm])))
+    return [_finish_triage(item, triaged[id(item)]) if id(item) in triaged else classify_item(item)
+            for item in items]
+
+
+RETRIAGE_MAX_ATTEMPTS = int(os.getenv("RETRIAGE_MAX_ATTEMPTS", "5"))
+RETRIAGE_BACKOFF = timedelta(minutes=int(os.getenv("RETRIAGE_BACKOFF_MINUTES", "10")))
+
+
+def retriage_pending(limit=25):
+    """
+    Re-runs summarize + classify for stored emails whose triage failed earlier; returns how many were fixed.
+
+    Each failure pushes the email's next attempt back (RETRIAGE_BACKOFF, doubling), and emails that
+    failed RETRIAGE_MAX_ATTEMPTS times are left alone, so they cannot crowd out newer failures.
+    """
+    now = datetime.now(timezone.utc)
+    with session_scope() as db:
+        pending = db.query(Email.id, Email.body).filter(
+            Email.triage_label.is_(None), Email.body.isnot(None),
+            func.coalesce(Email.triage_attempts, 0) < RETRIAGE_MAX_ATTEMPTS,
+            or_(Email.next_triage_at.is_(None), Email.next_triage_at <= now),
+        ).order_by(Email.id).limit(limit).all()
+
+    summaries = [summarize_email_content(body) for _, body in pending]
+    triaged = {i: None for i, summary in enumerate(summaries) if summary == SUMMARY_ERROR}
+    ok = [i for i in range(len(summaries)) if i not in triaged]
+    if BATCH_TRIAGE:
+        triaged.update(zip(ok, classify_summaries([summaries[i] for i in ok])))
+    else:
+        triaged.update((i, classify_email_with_llama3(summaries[i])) for i in ok)
+
+    resolved = 0
+    for i, (email_id, body) in enumerate(pending):
+        summary, triage_data = summaries[i], triaged[i]
+        if triage_data is None:
+            with session_scope() as db:
+                email = db.get(Email, email_id)
+                email.triage_attempts = (email.triage_attempts or 0) + 1
+                email.next_triage_at = now + RETRIAGE_BACKOFF * 2 ** (email.triage_attempts - 1)
+            continue
+        with session_scope() as db:
+            email = db.get(Email, email_id)
+            email.triage_label = triage_data["label"]
+            email.triage_subtype = triage_data["subtype"]
+            email.snippet = summary[:150]
+            if triage_data.get("due_time"):
+                email.draft_reply = json.dumps({"due_time": triage_data["due_time"]})
+        triage_cache.store(body, _triage_cache_model(), summary, triage_data)
+        resolved += 1
+    if pending:
+        print(f"🔁 Re-triaged {resolved}/{len(pending)} pending email(s)")
+    return resolved
+
+
+def build_ingest_pipeline(service, monitored_email):
+    return IngestPipeline(
+        fetch=lambda ids: {msg_id: parse_message(msg_data)
+                           for msg_id, msg_data in batch_get_messages(service, ids).items()},
+        summarize=summarize_item,
+        classify=classify_item,
+        persist=lambda item: store_email(item, monitored_email),
+        classify_batch=classify_items if BATCH_TRIAGE else None,
+    )
+
+
+FULL_RESYNC_LIMIT = int(os.getenv("FULL_RESYNC_LIMIT", "20"))
+
+
+def list_inbox_message_ids(service, max_results=20, minutes_since=None):
+    """Lists the newest INBOX message ids, optionally only those newer than `minutes_since`."""
+    params = {"userId": "me", "labelIds": ["INBOX"], "maxResults": max_results}
+    if minutes_since:
+        params["q"] = f"after:{int(time.time()) - int(minutes_since) * 60}"
+    results = service.users().messages().list(**params).execute()
+    return [msg["id"] for msg in results.get("messages", [])]
+
+
+def list_history_changes(service, start_history_id):
+    """
+    Walks users.history.list from a stored checkpoint.
+
+    Returns (added_ids, removed_ids, latest_history_id). Added ids are newest
+    first and exclude messages that were removed again inside the same window.
+    """
+    added, removed = [], set()
+    latest_history_id = start_history_id
+    page_token = None
+
+    while True:
+        params = {
+            "userId": "me",
+            "startHistoryId": start_history_id,
+            "labelId": "INBOX",
+            "historyTypes": ["messageAdded", "messageDeleted"],
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        response = service.users().history().list(**params).execute()
+
+        for record in response.get("history", []):
+            for item in record.get("messagesAdded", []):
+                message = item["message"]
+                if "INBOX" in message.get("labelIds", []) and message["id"] not in added:
+                    added.append(message["id"])
+            for item in record.get("messagesDeleted", []):
+                removed.add(item["message"]["id"])
+
+        latest_history_id = response.get("historyId", latest_history_id)
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+
+    added = [msg_id for msg_id in reversed(added) if msg_id not in removed]
+    return added, removed, latest_history_id
+
+
+def incremental_message_ids(service, mailbox, minutes_since=None):
+    """
+    Returns (message_ids, history_id) of INBOX messages added since the last sync.
+
+    Without a checkpoint, or once Gmail has expired it (HTTP 404), falls back to
+    a full resync bounded by FULL_RESYNC_LIMIT and `minutes_since`.
+    """
+    checkpoint = get_history_id(mailbox)
+    if checkpoint:
+        try:
+            added, removed, latest_history_id = list_history_changes(service, checkpoint)
+            if removed:
+                print(f"🗑 {len(removed)} message(s) removed from INBOX since last sync")
+            return added, latest_history_id
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            print(f"⚠️ History checkpoint {checkpoint} expired → running bounded full resync")
+
+    # Take the profile historyId *before* listing so nothing slips between the two calls
+    history_id = service.users().getProfile(userId="me").execute().get("historyId")
+    return list_inbox_message_ids(service, FULL_RESYNC_LIMIT, minutes_since), history_id
+
+
+def fetch_emails(incremental=False, minutes_since=None, raise_errors=False):
+    """
+    Fetches, summarizes, classifies and stores INBOX messages.
+
+    With `incremental=True` only messages added since the stored historyId
+    checkpoint are fetched, and the checkpoint is advanced once all of them
+    are stored.
+    Errors are logged and an empty list returned, unless `raise_errors` is set.
+    """
     service = get_gmail_service()
     settings = load_settings()
     monitored_email = settings.get("monitored_email", "")
@@ -201,83 +741,125 @@ def fetch_emails():
         return []
 
     try:
-        results = service.users().messages().list(userId="me", labelIds=["INBOX"], maxResults=20).execute()
-        messages = results.get("messages", [])
-
-        email_list = []
-        for msg in messages:
-            msg_data = service.users().messages().get(userId="me", id=msg["id"]).execute()
-            headers = msg_data.get("payload", {}).get("headers", [])
-
-            from_field = next((h["value"] for h in headers if h["name"].lower() in ["from", "reply-to", "sender"]), "Unknown Sender")
-            sender = extract_email_address(from_field)
-            subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), "No Subject")
-
-            payload = msg_data.get("payload", {})
-            text_body = ""
-            html_body = ""
-
-            if "parts" in payload:
-                for part in payload["parts"]:
-                    mime_type = part.get("mimeType", "")
-                    data = part.get("body", {}).get("data", "")
-                    if data:
-                        decoded_data = base64.urlsafe_b64decode(data).decode("utf-8", errors="ignore")
-                        if mime_type == "text/plain":
-                            text_body = decoded_data.strip()
-                        elif mime_type == "text/html":
-                            html_body = decoded_data.strip()
-            elif "body" in payload and "data" in payload["body"]:
-                text_body = base64.urlsafe_b64decode(payload["body"]["data"]).decode("utf-8", errors="ignore")
-
-            if not html_body and text_body:
-                html_body = f"<p>{text_body}</p>"
-
-            summarized_content = summarize_email_content(html_body)
-            triage_data = classify_email_with_llama3(summarized_content)
-            label = triage_data["label"]
-            subtype = triage_data["subtype"]
-
-            # ✅ INSERT INTO DATABASE (skip if already exists)
-            with session_scope() as db:
-                exists = db.query(Email).filter_by(gmail_id=msg["id"]).first()
-                if not exists:
-                    email_record = Email(
-                        gmail_id=msg["id"],
-                        from_addr=sender,
-                        to_addr=monitored_email,
-                        subject=subject,
-                        snippet=summarized_content[:150],
-                        body=html_body,
-                        triage_label=label,
-                        triage_subtype=subtype,
-                        draft_reply=json.dumps({"due_time": triage_data.get("due_time")}) if triage_data.get(
-                            "due_time") else None
-                    )
-
-                    db.add(email_record)
-                    print(f"✅ Inserted email '{subject}'")
-                else:
-                    print(f"⚠️ Email '{subject}' already in DB → skipping")
-
-            email_list.append({
-                "from_email": sender,
-                "subject": subject,
-                "classification": label,
-                "subtype": subtype,
-                "summary": summarized_content,
-                "html_content": html_body,
-            })
+        history_id = None
+        if incremental:
+            message_ids, history_id = incremental_message_ids(service, monitored_email, minutes_since)
+        else:
+            message_ids = list_inbox_message_ids(service, 20, minutes_since)
+
+        # Drop messages we already stored before paying for download, summarization and triage
+        known_ids = existing_gmail_ids(message_ids)
+        if known_ids:
+            print(f"⚠️ {len(known_ids)} email(s) already in DB → skipping")
+        message_ids = [msg_id for msg_id in message_ids if msg_id not in known_ids]
+
+        email_list = build_ingest_pipeline(service, monitored_email).run(message_ids)
+
+        if history_id:
+            # Advance only once every added message is stored: otherwise the next sync replays
+            # the same history window, and the DB pre-filter skips the ones that did land
+            unsaved = set(message_ids) - existing_gmail_ids(message_ids)
+            if unsaved:
+                print(f"⚠️ {len(unsaved)} message(s) not stored → keeping history checkpoint for retry")
+            else:
+                save_history_id(monitored_email, history_id)
 
         return email_list
 
     except Exception as e:
         print(f"❌ Error fetching emails: {e}")
+        if raise_errors:
+            raise
         return []
 
 
-def send_email(to_email, subject, message_text):
+def backfill_mailbox(page_size=100, batch_size=25, max_pages=None, restart=False):
+    """
+    Ingests the whole INBOX page by page, resuming from the stored cursor.
+
+    Each messages.list page is filtered against the DB and pushed through the
+    ingest pipeline in chunks of `batch_size`. The cursor is saved after every
+    finished page, so a restart only redoes the page that was in flight (and the
+    already-stored messages on it are skipped by the DB pre-filter).
+    """
     service = get_gmail_service()
+    monitored_email = load_settings().get("monitored_email", "")
+    if not monitored_email:
+        print("❌ No monitored email set.")
+        return None
+
+    if restart:
+        reset_backfill_state(monitored_email)
+    state = get_backfill_state(monitored_email) or {
+        "page_token": None, "pages_done": 0, "messages_done": 0, "completed": False,
+    }
+    if state["completed"]:
+        print(f"✅ Backfill for {monitored_email} already completed ({state['messages_done']} messages).")
+        return state
+
+    pipeline = build_ingest_pipeline(service, monitored_email)
+    page_token = state["page_token"]
+    pages_done, messages_done = state["pages_done"], state["messages_done"]
+    pages_this_run = 0
+    started = time.monotonic()
+    tokens_at_start = get_metric("llm.tokens")
+
+    while True:
+        params = {"userId": "me", "labelIds": ["INBOX"], "maxResults": page_size}
+        if page_token:
+            params["pageToken"] = page_token
+        response = service.users().messages().list(**params).execute()
+        page_ids = [msg["id"] for msg in response.get("messages", [])]
+
+        known_ids = existing_gmail_ids(page_ids)
+        new_ids = [msg_id for msg_id in page_ids if msg_id not in known_ids]
+        unfetched = []
+        for start in range(0, len(new_ids), batch_size):
+            messages_done += len(pipeline.run(new_ids[start:start + batch_size]))
+            unfetched += pipeline.unfetched
+        if unfetched:
+            # Keep the cursor on this page so the next run downloads them again
+            print(f"⚠️ {len(unfetched)} message(s) could not be downloaded → stopping, page will be retried")
+            save_backfill_state(monitored_email, page_token, pages_done, messages_done, completed=False)
+            break
+
+        page_token = response.get("nextPageToken")
+        pages_done += 1
+        pages_this_run += 1
+        save_backfill_state(monitored_email, page_token, pages_done, messages_done, completed=page_token is None)
+
+        minutes = max(time.monotonic() - started, 1e-6) / 60
+        ingested = messages_done - state["messages_done"]
+        tokens = get_metric("llm.tokens") - tokens_at_start
+        print(f"📦 Page {pages_done}: {len(new_ids)} new / {len(page_ids)} listed | "
+              f"{ingested / minutes:.1f} msgs/min | {tokens / minutes:.0f} tokens/min | "
+              f"cache hit rate {triage_cache.stats()['hit_rate']:.0%}"
+              + (f" | cascade escalation rate {model_cascade.stats()['escalation_rate']:.0%}"
+                 if model_cascade.ENABLED else ""))
+
+        if not page_token or (max_pages and pages_this_run >= max_pages):
+            break
+
+    return get_backfill_state(monitored_email)
+
+
+def deliver_email(to_email, subject, message_text):
+    """Sends one message through the Gmail API and returns its Gmail id; raises on any failure."""
+    monitored_email = load_settings().get("monitored_email")
+    if not monitored_email:
+        raise ValueError("No monitored email set.")
+
+    message = MIMEText(message_text)
+    message["to"] = to_email
+    message["from"] = monitored_email
+    message["subject"] = subject
+
+    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+    sent = get_gmail_service().users().messages().send(userId="me", body={"raw": raw_message}).execute()
+    return sent.get("id")
+
+
+def send_email(to_email, subject, message_text):
     settings = load_settings()
     monitored_email = settings.get("monitored_email")
 
@@ -288,15 +870,7 @@ def send_email(to_email, subject, message_text):
         return False, "Missing required fields."
 
     try:
-        message = MIMEText(message_text)
-        message["to"] = to_email
-        message["from"] = monitored_email
-        message["subject"] = subject
-
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        message_body = {"raw": raw_message}
-
-        service.users().messages().send(userId="me", body=message_body).execute()
+        deliver_email(to_email, subject, message_text)
         return True, f"✅ Email sent to {to_email}!"
     except Exception as e:
         return False, f"❌ Error sending email: {e}"
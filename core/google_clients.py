@@ -0,0 +1,167 @@
+"""Process-wide cache of Google OAuth credentials and API clients, with proactive token refresh."""
+
+import copy
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+SECRETS_DIR = os.path.join(os.path.dirname(__file__), "../.secrets")
+SECRETS_FILE = os.path.join(SECRETS_DIR, "client_secret.json")
+TOKEN_FILE = os.path.join(SECRETS_DIR, "token.json")
+
+SCOPES = [
+    "https://www.googleapis.com/auth/gmail.modify",
+    "https://www.googleapis.com/auth/calendar",
+]
+
+# Refresh access tokens this long before they expire, checked every REFRESH_CHECK_SECONDS
+REFRESH_MARGIN = timedelta(seconds=int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "300")))
+REFRESH_CHECK_SECONDS = int(os.getenv("TOKEN_REFRESH_CHECK_SECONDS", "60"))
+# Built clients kept per (mailbox, api, version) for threads that start after their owner exited
+CLIENT_POOL_SIZE = int(os.getenv("GOOGLE_CLIENT_POOL_SIZE", "8"))
+
+_lock = threading.RLock()
+_credentials = {}  # mailbox -> Credentials
+_generation = 0  # bumped by invalidate() so every thread drops its cached clients
+_local = threading.local()  # googleapiclient clients wrap httplib2, which is not thread-safe
+_pool_lock = threading.RLock()  # reentrant: _ThreadClients.__del__ may run during a garbage collection anywhere
+_idle = {}  # (mailbox, api, version) -> [client] no thread is using
+_refresher = None
+
+
+def _save(creds):
+    with open(TOKEN_FILE, "w") as token:
+        token.write(creds.to_json())
+
+
+def _expires_soon(creds):
+    if not creds.expiry:
+        return not creds.valid
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - REFRESH_MARGIN <= now
+
+
+def _request():
+    from google.auth.transport.requests import Request
+
+    return Request()
+
+
+def _load_credentials():
+    # The Google auth/discovery stack is slow to import, so load it on first use
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    creds = None
+    if os.path.exists(TOKEN_FILE):
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(_request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(SECRETS_FILE, SCOPES)
+            creds = flow.run_local_server(port=0)
+        _save(creds)
+    return creds
+
+
+def _refresh(creds):
+    """
+    Refreshes a copy of `creds` without holding the lock (it is a network call), then
+    swaps the new token into the shared object, which every built client references.
+    """
+    fresh = copy.copy(creds)
+    fresh.refresh(_request())
+    with _lock:
+        creds.__dict__.update(fresh.__dict__)
+        _save(creds)
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_CHECK_SECONDS)
+        with _lock:
+            due = [(mailbox, creds) for mailbox, creds in _credentials.items()
+                   if creds.refresh_token and _expires_soon(creds)]
+        for mailbox, creds in due:
+            try:
+                _refresh(creds)
+                logger.info(f"Refreshed Google token for {mailbox}")
+            except Exception as e:
+                logger.warning(f"Background token refresh failed for {mailbox}: {e}")
+
+
+def _ensure_refresher():
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name="google-token-refresher", daemon=True)
+        _refresher.start()
+
+
+def get_credentials(mailbox="me"):
+    """Returns cached credentials for `mailbox`, loading them from token.json on first use."""
+    with _lock:
+        creds = _credentials.get(mailbox)
+        if creds is None:
+            creds = _credentials[mailbox] = _load_credentials()
+        _ensure_refresher()
+    if creds.refresh_token and _expires_soon(creds):
+        _refresh(creds)
+    return creds
+
+
+class _ThreadClients(dict):
+    """The clients one thread has checked out; they return to the idle pool when the thread exits."""
+
+    def __init__(self, generation):
+        super().__init__()
+        self.generation = generation
+
+    def __del__(self):
+        with _pool_lock:
+            if self.generation != _generation:
+                return
+            for key, service in self.items():
+                idle = _idle.setdefault(key, [])
+                if len(idle) < CLIENT_POOL_SIZE:
+                    idle.append(service)
+
+
+def get_service(api, version, mailbox="me"):
+    """
+    Returns a built API client for the calling thread, reused across its calls.
+    A new thread takes an idle client from the pool before building one.
+    """
+    creds = get_credentials(mailbox)
+    services = getattr(_local, "services", None)
+    if services is None or services.generation != _generation:
+        services = _local.services = _ThreadClients(_generation)
+    key = (mailbox, api, version)
+    if key not in services:
+        with _pool_lock:
+            idle = _idle.get(key)
+            service = idle.pop() if idle else None
+        if service is None:
+            from googleapiclient.discovery import build
+
+            service = build(api, version, credentials=creds, cache_discovery=False)
+        services[key] = service
+    return services[key]
+
+
+def invalidate(mailbox=None):
+    """Drops cached credentials (all mailboxes if None) and every thread's cached clients."""
+    global _generation
+    with _lock:
+        if mailbox is None:
+            _credentials.clear()
+        else:
+            _credentials.pop(mailbox, None)
+        with _pool_lock:
+            _generation += 1
+            _idle.clear()
@@ -0,0 +1,92 @@
+"""Deterministic header-based triage for bulk mail (promotions, social notifications, mailing lists)."""
+
+import os
+from dataclasses import dataclass
+
+from core import metrics
+
+MIN_CONFIDENCE = float(os.getenv("HEADER_RULES_MIN_CONFIDENCE", "0.85"))
+
+SOCIAL_DOMAINS = {
+    "facebookmail.com", "linkedin.com", "twitter.com", "x.com", "instagram.com", "pinterest.com",
+    "reddit.com", "redditmail.com", "quora.com", "tiktok.com", "discord.com", "meetup.com",
+}
+MARKETING_DOMAINS = {
+    "mcsv.net", "rsgsv.net", "mcdlv.net", "klaviyomail.com", "ccsend.com",
+    "hubspotemail.net", "sendinblue.com", "mailgun.org", "exacttarget.com",
+}
+
+
+@dataclass
+class RuleMatch:
+    label: str
+    subtype: str
+    confidence: float
+    rule: str
+
+
+def _sender_domain(sender: str) -> str:
+    return sender.rsplit("@", 1)[-1].lower().strip("> ") if "@" in sender else ""
+
+
+def _matches_domain(domain: str, known: set) -> bool:
+    return any(domain == d or domain.endswith("." + d) for d in known)
+
+
+# Each rule: (name, predicate(headers, label_ids, sender_domain), label, subtype, confidence)
+# `headers` maps lower-cased header names to values.
+RULES = [
+    ("gmail_spam", lambda h, labels, d: "SPAM" in labels, "no", "SPAM", 0.99),
+    ("gmail_category_promotions", lambda h, labels, d: "CATEGORY_PROMOTIONS" in labels, "no", "PROMOTION", 0.9),
+    ("gmail_category_social", lambda h, labels, d: "CATEGORY_SOCIAL" in labels, "no", "SOCIAL", 0.9),
+    ("gmail_category_forums", lambda h, labels, d: "CATEGORY_FORUMS" in labels, "no", "SOCIAL", 0.7),
+    # Kept below MIN_CONFIDENCE: these domains also send security and account mail, so
+    # the sender only counts together with a bulk header or a Gmail category
+    ("social_sender_domain", lambda h, labels, d: _matches_domain(d, SOCIAL_DOMAINS), "no", "SOCIAL", 0.7),
+    ("marketing_sender_domain", lambda h, labels, d: _matches_domain(d, MARKETING_DOMAINS), "no", "PROMOTION", 0.7),
+    ("precedence_bulk", lambda h, labels, d: h.get("precedence", "").strip().lower() in ("bulk", "junk"),
+     "no", "PROMOTION", 0.7),
+    ("precedence_list", lambda h, labels, d: h.get("precedence", "").strip().lower() == "list" or "list-id" in h,
+     "no", "SOCIAL", 0.5),
+    # Receipts and security alerts often carry List-Unsubscribe too, so on its own it is only a hint
+    ("list_unsubscribe", lambda h, labels, d: "list-unsubscribe" in h and not _matches_domain(d, SOCIAL_DOMAINS),
+     "no", "PROMOTION", 0.6),
+    ("social_list_unsubscribe", lambda h, labels, d: "list-unsubscribe" in h and _matches_domain(d, SOCIAL_DOMAINS),
+     "no", "SOCIAL", 0.6),
+]
+
+
+def triage_from_headers(headers: dict, label_ids=(), sender: str = "") -> RuleMatch | None:
+    """
+    Runs every rule and returns the strongest (label, subtype) verdict, or None.
+
+    Rules that agree on the same verdict reinforce each other
+    (confidence = 1 - Π(1 - c)), so e.g. List-Unsubscribe plus Precedence: bulk
+    is stronger than either alone. Callers decide whether the confidence is
+    high enough to skip the LLM (see MIN_CONFIDENCE).
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    labels = set(label_ids or ())
+    domain = _sender_domain(sender)
+
+    verdicts = {}
+    for name, predicate, label, subtype, confidence in RULES:
+        if predicate(headers, labels, domain):
+            rules, miss = verdicts.get((label, subtype), ([], 1.0))
+            verdicts[(label, subtype)] = (rules + [name], miss * (1 - confidence))
+
+    if not verdicts:
+        return None
+    (label, subtype), (rules, miss) = min(verdicts.items(), key=lambda item: item[1][1])
+    return RuleMatch(label, subtype, round(1 - miss, 4), "+".join(rules))
+
+
+def confident_match(headers: dict, label_ids=(), sender: str = "", min_confidence: float = MIN_CONFIDENCE):
+    """Returns the rule verdict only if it clears `min_confidence`, counting hits in core.metrics."""
+    match = triage_from_headers(headers, label_ids, sender)
+    if match is None or match.confidence < min_confidence:
+        metrics.incr("header_rules.deferred")
+        return None
+    metrics.incr("header_rules.matched")
+    metrics.incr(f"header_rules.{match.rule}")
+    return match
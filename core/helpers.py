@@ -1,5 +1,4 @@
 import re
-import markdown
 
 def strip_html_tags(text):
     if not text:
@@ -13,5 +12,7 @@ def markdownify(text):
     """
     Cleans raw HTML and converts to Markdown-styled HTML for safe rendering.
     """
+    import markdown  # only needed when a page actually renders email bodies
+
     cleaned = strip_html_tags(text)
     return markdown.markdown(cleaned, extensions=["extra", "sane_lists"])
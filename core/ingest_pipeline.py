@@ -0,0 +1,162 @@
+"""Pipelined email ingest: fetch → summarize → classify → persist with bounded per-stage concurrency."""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+FETCH_BATCH_SIZE = int(os.getenv("INGEST_FETCH_BATCH_SIZE", "10"))
+SUMMARIZE_CONCURRENCY = int(os.getenv("INGEST_SUMMARIZE_CONCURRENCY", "4"))
+CLASSIFY_CONCURRENCY = int(os.getenv("INGEST_CLASSIFY_CONCURRENCY", "4"))
+
+
+class IngestPipeline:
+    """
+    Overlaps message download with the LLM stages of earlier messages.
+
+    Stages are plain callables so the pipeline stays independent of Gmail and Groq:
+        fetch(ids) -> {gmail_id: item}   called on the caller's thread, one batch at a time
+        summarize(item) -> str           stored as item["summary"]
+        classify(item) -> dict           stored as item["triage"]
+        persist(item) -> record | None   called on the caller's thread, in input order
+
+    Finished items are persisted between fetch batches, and a fetch batch that
+    raises is logged and skipped (its ids end up in `unfetched`), so one bad
+    batch never discards work already done.
+
+    With `classify_batch(items) -> [dict]` instead of `classify`, each fetch batch
+    is classified together once all of its messages are summarized.
+
+    Running fetch and persist on the caller's thread keeps the (non thread-safe)
+    Gmail client and SQLite writes single-threaded; only the LLM stages fan out.
+    """
+
+    def __init__(self, fetch, summarize, classify, persist,
+                 fetch_batch_size=FETCH_BATCH_SIZE,
+                 summarize_concurrency=SUMMARIZE_CONCURRENCY,
+                 classify_concurrency=CLASSIFY_CONCURRENCY,
+                 classify_batch=None):
+        self.fetch = fetch
+        self.summarize = summarize
+        self.classify = classify
+        self.classify_batch = classify_batch
+        self.persist = persist
+        self.fetch_batch_size = max(1, fetch_batch_size)
+        self.summarize_concurrency = max(1, summarize_concurrency)
+        self.classify_concurrency = max(1, classify_concurrency)
+        self._summarize_slots = threading.BoundedSemaphore(self.summarize_concurrency)
+        self._classify_slots = threading.BoundedSemaphore(self.classify_concurrency)
+        self.unfetched = []  # ids of the last run whose fetch batch failed
+
+    def _summarize(self, item):
+        with self._summarize_slots:
+            item["summary"] = self.summarize(item)
+        return item
+
+    def _process(self, item):
+        self._summarize(item)
+        with self._classify_slots:
+            item["triage"] = self.classify(item)
+        return item
+
+    def _classify_group(self, entries):
+        """Classifies the successfully summarized items of one fetch batch; returns [(msg_id, item or error)]."""
+        outcomes = []
+        for msg_id, future in entries:
+            error = future.exception()
+            outcomes.append((msg_id, error if error else future.result()))
+        ready = [item for _, item in outcomes if not isinstance(item, Exception)]
+        if ready:
+            try:
+                for item, triage in zip(ready, self.classify_batch(ready), strict=True):
+                    item["triage"] = triage
+            except Exception as e:
+                return [(msg_id, e) for msg_id, _ in outcomes]
+        return outcomes
+
+    def _classify_when_summarized(self, classify_pool, entries):
+        """Returns a future for the group's outcomes, started once its last summary is done."""
+        group = Future()
+        remaining = [len(entries)]
+        lock = threading.Lock()
+
+        def summarized(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            task = classify_pool.submit(self._classify_group, entries)
+            task.add_done_callback(
+                lambda done: group.set_exception(done.exception()) if done.exception() else group.set_result(done.result())
+            )
+
+        for _, future in entries:
+            future.add_done_callback(summarized)
+        return group
+
+    def _fetch(self, batch_ids):
+        """Fetches one batch; on failure logs it and returns nothing, leaving those ids unstored for a retry."""
+        try:
+            return self.fetch(batch_ids)
+        except Exception as e:
+            print(f"❌ Error fetching {len(batch_ids)} message(s) starting at {batch_ids[0]}: {e}")
+            self.unfetched.extend(batch_ids)
+            return {}
+
+    def _persist(self, msg_id, outcome, records):
+        try:
+            if isinstance(outcome, Exception):
+                raise outcome
+            record = self.persist(outcome)
+        except Exception as e:
+            print(f"❌ Error ingesting message {msg_id}: {e}")
+            return
+        if record is not None:
+            records.append(record)
+
+    def _run_batched(self, message_ids):
+        records = []
+        groups = deque()
+
+        def persist_groups(wait=False):
+            while groups and (wait or groups[0].done()):
+                for msg_id, outcome in groups.popleft().result():
+                    self._persist(msg_id, outcome, records)
+
+        with ThreadPoolExecutor(max_workers=self.summarize_concurrency) as summarize_pool, \
+                ThreadPoolExecutor(max_workers=self.classify_concurrency) as classify_pool:
+            for start in range(0, len(message_ids), self.fetch_batch_size):
+                batch_ids = message_ids[start:start + self.fetch_batch_size]
+                items = self._fetch(batch_ids)
+                entries = [(msg_id, summarize_pool.submit(self._summarize, items[msg_id]))
+                           for msg_id in batch_ids if msg_id in items]
+                if entries:
+                    groups.append(self._classify_when_summarized(classify_pool, entries))
+                persist_groups()
+            persist_groups(wait=True)
+        return records
+
+    def run(self, message_ids):
+        """Runs every id through the pipeline and returns the persisted records in input order."""
+        self.unfetched = []
+        if self.classify_batch is not None:
+            return self._run_batched(message_ids)
+        records = []
+        futures = deque()
+
+        def persist_finished(wait=False):
+            while futures and (wait or futures[0][1].done()):
+                msg_id, future = futures.popleft()
+                self._persist(msg_id, future.exception() or future.result(), records)
+
+        workers = self.summarize_concurrency + self.classify_concurrency
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(message_ids), self.fetch_batch_size):
+                batch_ids = message_ids[start:start + self.fetch_batch_size]
+                items = self._fetch(batch_ids)
+                for msg_id in batch_ids:
+                    if msg_id in items:
+                        futures.append((msg_id, pool.submit(self._process, items[msg_id])))
+                persist_finished()
+            persist_finished(wait=True)
+        return records
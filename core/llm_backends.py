@@ -0,0 +1,249 @@
+"""
+Routing of LLM calls across backends (Groq first, local Ollama as fallback):
+failover on errors, optional hedging of slow requests from rolling p95
+latency, and a record of which backend served each call.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "120"))
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "1"))  # a local model serves one request at a time well
+
+# Send a duplicate request to the next backend once the first has run longer than its p95
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+# Order backends by observed p95 latency instead of the configured order
+ROUTE_BY_LATENCY = os.getenv("LLM_ROUTE_BY_LATENCY", "").lower() in ("1", "true", "yes")
+# A backend that just failed is tried last for this long
+FAILURE_COOLDOWN_SECONDS = float(os.getenv("LLM_BACKEND_COOLDOWN_SECONDS", "30"))
+MIN_SAMPLES_FOR_P95 = 10
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per "backend:task" key, plus recent failures per backend."""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._failed_at = {}
+        self.window = window
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def record_failure(self, backend: str) -> None:
+        with self._lock:
+            self._failed_at[backend] = time.monotonic()
+
+    def cooling_down(self, backend: str) -> bool:
+        with self._lock:
+            failed_at = self._failed_at.get(backend)
+        return failed_at is not None and time.monotonic() - failed_at < FAILURE_COOLDOWN_SECONDS
+
+    def p95(self, key: str) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < MIN_SAMPLES_FOR_P95:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            keys = {key: len(samples) for key, samples in self._samples.items()}
+        return {
+            key: {"p95_seconds": self.p95(key), "samples": count, "cooling_down": self.cooling_down(key.split(":")[0])}
+            for key, count in keys.items()
+        }
+
+
+latency = LatencyTracker()
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+class OllamaBackend:
+    """Local models through the `ollama` client; responses are returned as LangChain messages."""
+
+    name = "ollama"
+
+    def __init__(self, host=OLLAMA_HOST, model=OLLAMA_MODEL):
+        self.host = host
+        self.model = model
+        self._client = None
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max(OLLAMA_CONCURRENCY, 1))
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                import ollama
+
+                self._client = ollama.Client(host=self.host, timeout=OLLAMA_TIMEOUT_SECONDS)
+            return self._client
+
+    @staticmethod
+    def _messages(messages):
+        if isinstance(messages, str):
+            return [{"role": "user", "content": messages}]
+        return [m if isinstance(m, dict) else {"role": "user", "content": str(getattr(m, "content", m))}
+                for m in messages]
+
+    def _request(self, config, messages, bind_kwargs=None):
+        options = {}
+        if config.temperature is not None:
+            options["temperature"] = config.temperature
+        if config.max_tokens:
+            options["num_predict"] = config.max_tokens
+        request = {"model": self.model, "messages": self._messages(messages), "options": options}
+        if ((bind_kwargs or {}).get("response_format") or {}).get("type") == "json_object":
+            request["format"] = "json"
+        return request
+
+    @staticmethod
+    def _usage(response):
+        prompt_tokens = response.get("prompt_eval_count") or 0
+        output_tokens = response.get("eval_count") or 0
+        return {"input_tokens": prompt_tokens, "output_tokens": output_tokens, "total_tokens": prompt_tokens + output_tokens}
+
+    def invoke(self, config, messages, bind_kwargs=None):
+        from langchain_core.messages import AIMessage
+
+        with self._semaphore:
+            response = self._get_client().chat(**self._request(config, messages, bind_kwargs))
+        return AIMessage(
+            content=response["message"]["content"],
+            usage_metadata=self._usage(response),
+            response_metadata={"model_name": self.model},
+        )
+
+    def stream(self, config, messages):
+        from langchain_core.messages import AIMessageChunk
+
+        with self._semaphore:
+            for part in self._get_client().chat(**self._request(config, messages), stream=True):
+                yield AIMessageChunk(
+                    content=part["message"]["content"],
+                    usage_metadata=self._usage(part) if part.get("done") else None,
+                    response_metadata={"model_name": self.model} if part.get("done") else {},
+                )
+
+
+def _ranked(backends, label):
+    """Configured order, with backends that just failed moved last (and, optionally, faster p95 first)."""
+    def key(item):
+        index, backend = item
+        p95 = latency.p95(f"{backend.name}:{label}") if ROUTE_BY_LATENCY else None
+        return latency.cooling_down(backend.name), p95 or 0.0, index
+    return [backend for _, backend in sorted(enumerate(backends), key=key)]
+
+
+def _served(backend, response, started, primary, label):
+    seconds = time.monotonic() - started
+    latency.record(f"{backend.name}:{label}", seconds)
+    metrics.incr(f"llm.backend.{backend.name}.calls")
+    if backend is not primary:
+        metrics.incr("llm.fallbacks")
+    response.response_metadata = {**(response.response_metadata or {}), "backend": backend.name}
+    logger.info(f"LLM {label} call served by {backend.name} in {seconds:.2f}s")
+    return response
+
+
+def _failed(backend, error):
+    latency.record_failure(backend.name)
+    metrics.incr(f"llm.backend.{backend.name}.errors")
+    logger.warning(f"LLM backend {backend.name} failed: {error}")
+
+
+def _attempt(backend, call):
+    started = time.monotonic()
+    return call(backend), started
+
+
+def invoke(backends, call, label="llm", hedge=HEDGE_ENABLED):
+    """
+    Runs `call(backend)` on the first backend that succeeds and returns its
+    response, tagged with response_metadata["backend"].
+
+    With hedging on and enough latency history, the next backend is started
+    as well once the first has been running longer than its p95; whichever
+    finishes successfully first wins. If every backend fails, the first
+    backend's error is raised.
+    """
+    order = _ranked(backends, label)
+    primary = backends[0]
+    first_error = None
+    position = 0
+    while position < len(order):
+        backend = order[position]
+        hedge_after = latency.p95(f"{backend.name}:{label}") if hedge and position + 1 < len(order) else None
+        if hedge_after is None:
+            try:
+                response, started = _attempt(backend, call)
+                return _served(backend, response, started, primary, label)
+            except Exception as e:
+                _failed(backend, e)
+                first_error = first_error or e
+                position += 1
+                continue
+
+        futures = {_hedge_pool.submit(_attempt, backend, call): backend}
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            metrics.incr("llm.hedged")
+            futures[_hedge_pool.submit(_attempt, order[position + 1], call)] = order[position + 1]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response, started = future.result()
+                except Exception as e:
+                    _failed(futures[future], e)
+                    first_error = first_error or e
+                    continue
+                if len(futures) > 1 and futures[future] is not backend:
+                    metrics.incr("llm.hedge_wins")
+                return _served(futures[future], response, started, primary, label)
+        position += len(futures)
+    raise first_error
+
+
+def stream(backends, open_stream, label="llm"):
+    """
+    Yields (backend name, chunk) from the first backend whose stream starts
+    successfully. A backend that fails before its first chunk is skipped;
+    once text has been yielded, errors propagate.
+    """
+    first_error = None
+    primary = backends[0]
+    for backend in _ranked(backends, label):
+        started = time.monotonic()
+        yielded = False
+        try:
+            for chunk in open_stream(backend):
+                if not yielded:
+                    latency.record(f"{backend.name}:{label}:first_token", time.monotonic() - started)
+                    metrics.incr(f"llm.backend.{backend.name}.calls")
+                    if backend is not primary:
+                        metrics.incr("llm.fallbacks")
+                    logger.info(f"LLM {label} stream served by {backend.name}")
+                    yielded = True
+                yield backend.name, chunk
+        except Exception as e:
+            if yielded:
+                raise
+            _failed(backend, e)
+            first_error = first_error or e
+            continue
+        return
+    raise first_error
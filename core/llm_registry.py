@@ -0,0 +1,368 @@
+"""
+One lazily-built Groq chat client per model configuration, all sharing a single
+keep-alive HTTP connection pool, with per-model timeouts and concurrency limits,
+behind a persistent response cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+
+from core import llm_backends, metrics, rate_limiter
+from core.cache_store import SQLiteLRUCache
+from core.database import DATA_DIR
+from core.metrics import record_llm_usage
+from core.text_reducer import estimate_tokens
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    model: str
+    temperature: float | None = None
+    max_tokens: int | None = None
+    timeout: float = 60.0  # seconds per request
+    max_retries: int = 2
+    concurrency: int = 4  # in-flight requests allowed for this model across the process
+    requests_per_minute: int = 30  # provider limits, enforced across processes by core.rate_limiter
+    tokens_per_minute: int = 6000
+    context_window: int = 8192  # prompt + completion tokens the model accepts in one request
+
+
+# Which model each part of the app uses. Any field can be overridden per role with
+# LLM_<ROLE>_MODEL / _TIMEOUT / _CONCURRENCY / _MAX_TOKENS / _TEMPERATURE /
+# _REQUESTS_PER_MINUTE / _TOKENS_PER_MINUTE / _CONTEXT_WINDOW.
+ROLES = {
+    "summarizer": ModelConfig("llama-3.3-70b-versatile", temperature=0.3, max_tokens=32768, tokens_per_minute=12000,
+                              context_window=131072),
+    # A model no other role uses, so long-email map calls never drain the classifier/drafter token bucket
+    "chunk_summarizer": ModelConfig("meta-llama/llama-4-scout-17b-16e-instruct", temperature=0.2, max_tokens=1024,
+                                    tokens_per_minute=30000, context_window=131072),
+    "classifier": ModelConfig(os.getenv("CLASSIFIER_MODEL", "llama-3.1-8b-instant")),
+    "triage": ModelConfig("mixtral-8x7b-32768"),
+    # Model cascade (TRIAGE_CASCADE): sampled small model first, large model for uncertain emails
+    "triage_small": ModelConfig("llama-3.1-8b-instant", temperature=0.7),
+    "triage_large": ModelConfig("llama-3.3-70b-versatile", tokens_per_minute=12000),
+    "drafter": ModelConfig("llama-3.1-8b-instant", temperature=0.3),
+    "rewriter": ModelConfig(os.getenv("REWRITER_MODEL", "mistral-saba-24b")),
+}
+
+# Identical (model, parameters, prompt) requests are answered from disk for CACHE_TTL_SECONDS
+CACHE_ENABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_cache = SQLiteLRUCache(
+    DATA_DIR / "llm_cache.db",
+    name="llm_cache",
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+    ttl_seconds=CACHE_TTL_SECONDS,
+)
+
+# Completion tokens charged up front per call; corrected to the real usage afterwards
+COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "512"))
+# Times a call is re-queued after the provider itself answers 429
+PROVIDER_RATE_LIMIT_RETRIES = 5
+
+# Backends tried in order for every role (override per role with LLM_<ROLE>_BACKENDS)
+DEFAULT_BACKENDS = os.getenv("LLM_BACKENDS", "groq,ollama")
+
+_ENV_FIELDS = {
+    "model": str, "timeout": float, "max_retries": int, "concurrency": int, "max_tokens": int,
+    "temperature": float, "requests_per_minute": int, "tokens_per_minute": int, "context_window": int,
+}
+
+_lock = threading.Lock()
+_http_client = None
+_clients = {}  # ModelConfig (minus concurrency) -> ChatGroq
+_semaphores = {}  # model name -> BoundedSemaphore
+
+
+def get_config(role: str) -> ModelConfig:
+    """Returns the role's ModelConfig with any LLM_<ROLE>_* environment overrides applied."""
+    if role not in ROLES:
+        raise KeyError(f"Unknown LLM role: {role}")
+    overrides = {}
+    for name, cast in _ENV_FIELDS.items():
+        value = os.getenv(f"LLM_{role.upper()}_{name.upper()}")
+        if value:
+            overrides[name] = cast(value)
+    return replace(ROLES[role], **overrides)
+
+
+def _shared_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120),
+        )
+    return _http_client
+
+
+def get_llm(role: str):
+    """
+    Returns the chat client for `role`, built on first use.
+
+    Roles with identical settings get the same client, and every client sends
+    through one shared connection pool, so TLS setup is paid once per host.
+    """
+    return _client_for(get_config(role))
+
+
+def _client_for(config: ModelConfig):
+    key = _request_params(config)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            from langchain_groq import ChatGroq
+
+            client = _clients[key] = ChatGroq(
+                api_key=os.getenv("GROQ_API_KEY"),
+                model_name=config.model,
+                temperature=config.temperature if config.temperature is not None else 0.7,
+                max_tokens=config.max_tokens,
+                request_timeout=config.timeout,
+                max_retries=config.max_retries,
+                http_client=_shared_http_client(),
+            )
+        return client
+
+
+def _request_params(config: ModelConfig) -> ModelConfig:
+    """The config with process-side limits zeroed, i.e. only what shapes the request itself."""
+    return replace(config, concurrency=0, requests_per_minute=0, tokens_per_minute=0, context_window=0)
+
+
+def _semaphore(config: ModelConfig):
+    with _lock:
+        semaphore = _semaphores.get(config.model)
+        if semaphore is None:
+            semaphore = _semaphores[config.model] = threading.BoundedSemaphore(max(config.concurrency, 1))
+        return semaphore
+
+
+def _message_payload(message):
+    if isinstance(message, (str, dict)):
+        return message
+    return {"role": getattr(message, "type", type(message).__name__), "content": getattr(message, "content", str(message))}
+
+
+def cache_key(config: ModelConfig, messages, bind_kwargs: dict) -> str:
+    """Hash of everything that shapes the completion: model, sampling parameters, call options and prompt."""
+    params = asdict(replace(_request_params(config), timeout=0, max_retries=0))
+    prompt = [_message_payload(m) for m in messages] if isinstance(messages, list) else _message_payload(messages)
+    payload = json.dumps({"params": params, "bind": bind_kwargs, "prompt": prompt}, sort_keys=True, default=str)
+    return f"{config.model}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def _cached_response(entry: dict):
+    from langchain_core.messages import AIMessage
+
+    return AIMessage(
+        content=entry["content"],
+        response_metadata={**entry.get("response_metadata", {}), "cached": True},
+        usage_metadata=entry.get("usage_metadata"),
+    )
+
+
+def _store(key: str, config: ModelConfig, response) -> None:
+    if isinstance(response.content, str) and response.content.strip():
+        _cache.set(key, {
+            "content": response.content,
+            "usage_metadata": getattr(response, "usage_metadata", None),
+            "response_metadata": {"model_name": config.model},
+        })
+
+
+def invoke(role: str, messages, use_cache: bool = True, **bind_kwargs):
+    """
+    Sends `messages` to the role's model and returns the LangChain response.
+
+    A previous response to the same model, parameters and prompt is returned
+    from the on-disk cache (marked response_metadata["cached"]) unless
+    `use_cache` is False, in which case a fresh answer is fetched and stored.
+    Otherwise blocks while the model already has `concurrency` requests in
+    flight, and records token usage in core.metrics. `bind_kwargs` (e.g.
+    response_format) are bound onto the client for this call only.
+    """
+    config = get_config(role)
+    key = cache_key(config, messages, bind_kwargs) if CACHE_ENABLED else None
+    if key and use_cache:
+        entry = _cache.get(key)
+        if entry is not None:
+            return _cached_response(entry)
+
+    backends = get_backends(role)
+    response = llm_backends.invoke(
+        backends, lambda backend: backend.invoke(config, messages, bind_kwargs), label=role
+    )
+    record_llm_usage(response, response.response_metadata.get("model_name") or config.model)
+
+    # Fallback answers are not cached, so the primary model gets asked again next time
+    if key and response.response_metadata.get("backend") == backends[0].name:
+        _store(key, config, response)
+    return response
+
+
+def _prompt_text(messages) -> str:
+    parts = []
+    for message in messages if isinstance(messages, list) else [messages]:
+        payload = _message_payload(message)
+        parts.append(payload if isinstance(payload, str) else str(payload.get("content", "")))
+    return "\n".join(parts)
+
+
+def _retry_after(error) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 10))
+    except (TypeError, ValueError):
+        return 10.0
+
+
+def _reserve(config: ModelConfig, messages) -> int | None:
+    """Waits in the shared token buckets for this model; returns the tokens charged (None when disabled)."""
+    if not rate_limiter.ENABLED:
+        return None
+    estimate = estimate_tokens(_prompt_text(messages)) + min(config.max_tokens or COMPLETION_ESTIMATE, COMPLETION_ESTIMATE)
+    rate_limiter.limiter.acquire(config.model, config.requests_per_minute, config.tokens_per_minute, estimate)
+    return estimate
+
+
+def _settle(config: ModelConfig, estimate: int | None, response) -> None:
+    """Corrects the up-front charge to the usage the provider reported."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if estimate is not None and usage.get("total_tokens"):
+        rate_limiter.limiter.adjust(config.model, config.requests_per_minute, config.tokens_per_minute,
+                                    usage["total_tokens"] - estimate)
+
+
+def _should_requeue(config: ModelConfig, error, attempt: int) -> bool:
+    """On a provider 429 (with retries left), blocks the model's bucket for its Retry-After."""
+    if not rate_limiter.ENABLED or getattr(error, "status_code", None) != 429 or attempt == PROVIDER_RATE_LIMIT_RETRIES:
+        return False
+    rate_limiter.limiter.block(config.model, config.requests_per_minute, config.tokens_per_minute, _retry_after(error))
+    return True
+
+
+def _rate_limited_call(config: ModelConfig, llm, messages):
+    """
+    Queues in the shared token buckets for this model, then calls it under the
+    per-process concurrency limit. The bucket is charged an estimate up front
+    and corrected to the reported usage; a 429 from the provider blocks the
+    model's bucket for its Retry-After and re-queues the call.
+    """
+    for attempt in range(PROVIDER_RATE_LIMIT_RETRIES + 1):
+        estimate = _reserve(config, messages)
+        try:
+            with _semaphore(config):
+                response = llm.invoke(messages)
+        except Exception as e:
+            if _should_requeue(config, e, attempt):
+                continue
+            raise
+        _settle(config, estimate, response)
+        return response
+
+
+class GroqBackend:
+    """The Groq API through the pooled ChatGroq clients, behind the shared rate limiter."""
+
+    name = "groq"
+
+    def invoke(self, config: ModelConfig, messages, bind_kwargs=None):
+        llm = _client_for(config)
+        if bind_kwargs:
+            llm = llm.bind(**bind_kwargs)
+        return _rate_limited_call(config, llm, messages)
+
+    def stream(self, config: ModelConfig, messages):
+        llm = _client_for(config)
+        for attempt in range(PROVIDER_RATE_LIMIT_RETRIES + 1):
+            estimate = _reserve(config, messages)
+            full = None
+            try:
+                with _semaphore(config):
+                    for chunk in llm.stream(messages):
+                        full = chunk if full is None else full + chunk
+                        yield chunk
+            except Exception as e:
+                # Only retry if nothing has been sent to the caller yet
+                if full is None and _should_requeue(config, e, attempt):
+                    continue
+                raise
+            _settle(config, estimate, full)
+            return
+
+
+BACKENDS = {"groq": GroqBackend(), "ollama": llm_backends.OllamaBackend()}
+
+
+def get_backends(role: str) -> list:
+    """The role's backends in priority order, from LLM_<ROLE>_BACKENDS or LLM_BACKENDS (e.g. "groq,ollama")."""
+    names = os.getenv(f"LLM_{role.upper()}_BACKENDS") or DEFAULT_BACKENDS
+    backends = [BACKENDS[name.strip()] for name in names.split(",") if name.strip()]
+    if not backends:
+        raise ValueError(f"No LLM backends configured for {role}")
+    return backends
+
+
+def stream(role: str, messages, use_cache: bool = True):
+    """
+    Like invoke(), but yields the reply text piece by piece as the model produces it.
+
+    A cached reply is yielded whole. The concatenated reply is cached and its
+    usage recorded once the stream finishes; time to first token is tracked in
+    the llm.stream.* counters.
+    """
+    config = get_config(role)
+    key = cache_key(config, messages, {}) if CACHE_ENABLED else None
+    if key and use_cache:
+        entry = _cache.get(key)
+        if entry is not None:
+            yield entry["content"]
+            return
+
+    backends = get_backends(role)
+    started = time.monotonic()
+    full, served_by = None, None
+    for served_by, chunk in llm_backends.stream(backends, lambda backend: backend.stream(config, messages), label=role):
+        if full is None:
+            metrics.incr("llm.stream.calls")
+            metrics.incr("llm.stream.first_token_seconds", time.monotonic() - started)
+        full = chunk if full is None else full + chunk
+        if chunk.content:
+            yield chunk.content
+
+    if full is None:
+        return
+    record_llm_usage(full, full.response_metadata.get("model_name") or config.model)
+    if key and served_by == backends[0].name:
+        _store(key, config, full)
+
+
+def cache_stats() -> dict:
+    """Entries and hit rate of the response cache, for this process and across all processes."""
+    return _cache.stats()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+def model_name(role: str) -> str:
+    return get_config(role).model
+
+
+def reset() -> None:
+    """Drops every cached client and closes the shared connection pool (e.g. after changing env settings)."""
+    global _http_client
+    with _lock:
+        _clients.clear()
+        _semaphores.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
@@ -0,0 +1,248 @@
+"""
+Local triage model: hashed word features and a linear softmax classifier (NumPy),
+trained from the LLM labels already stored in the emails table. Confident
+predictions skip the LLM; everything else is forwarded to it as before.
+"""
+
+import os
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+
+from core import metrics
+from core.data_models import TRIAGE_SUBTYPES
+from core.database import DATA_DIR, Email, session_scope
+from core.text_reducer import reduce_for_prompt
+
+ENABLED = os.getenv("LOCAL_TRIAGE_DISABLED", "").lower() not in ("1", "true", "yes")
+MODEL_PATH = DATA_DIR / "local_triage.npz"
+# Predictions below this probability go to the LLM
+MIN_CONFIDENCE = float(os.getenv("LOCAL_TRIAGE_MIN_CONFIDENCE", "0.9"))
+# The model only gates anything once it has seen this many LLM-labeled emails
+MIN_EXAMPLES = int(os.getenv("LOCAL_TRIAGE_MIN_EXAMPLES", "200"))
+N_FEATURES = 2 ** 18
+MAX_WORDS = 400  # of the (reduced) body; subject and sender are always used
+
+# Recorded as emails.triage_rule so these labels are never trained on again
+RULE = "local_model"
+# The LLM also extracts the due time for these, which the local model cannot do
+TIME_SENSITIVE_SUBTYPES = {"DEADLINE_TASK", "MEETING_INVITE", "SCHEDULE_REQUEST"}
+
+CLASSES = [(label, subtype) for label, subtypes in TRIAGE_SUBTYPES.items() for subtype in subtypes]
+_CLASS_INDEX = {pair: i for i, pair in enumerate(CLASSES)}
+
+LEARNING_RATE = 0.5
+TRAIN_EPOCHS = 5
+UPDATE_EPOCHS = 2
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'._-]*[a-z0-9]|[a-z0-9]")
+
+
+@dataclass
+class Prediction:
+    label: str
+    subtype: str
+    confidence: float
+
+
+def _tokens(subject, sender, text):
+    sender = (sender or "").lower()
+    address = sender[sender.find("<") + 1:sender.rfind(">")] if "<" in sender else sender.strip()
+    tokens = ["from:" + address, "domain:" + address.rsplit("@", 1)[-1]]
+    tokens += ["subj:" + word for word in _WORD_RE.findall((subject or "").lower())]
+    words = _WORD_RE.findall((text or "").lower())[:MAX_WORDS]
+    tokens += words
+    tokens += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return tokens
+
+
+def features(subject, sender, text, n_features=N_FEATURES):
+    """Signed hashing-trick features as (indices, values), L2-normalized."""
+    import numpy as np
+
+    hashes = np.fromiter((zlib.crc32(token.encode()) for token in _tokens(subject, sender, text)), dtype=np.uint32)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+    indices, inverse = np.unique(hashes & (n_features - 1), return_inverse=True)
+    values = np.bincount(inverse, weights=signs).astype(np.float32)
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return indices.astype(np.int64), values
+
+
+def email_features(subject, sender, body):
+    """Features of a raw (HTML or text) email body, reduced the same way as for the LLM."""
+    return features(subject, sender, reduce_for_prompt(body or "").text)
+
+
+class LocalTriageModel:
+    """Multinomial logistic regression over hashed features, trained with plain SGD."""
+
+    def __init__(self, n_features=N_FEATURES):
+        import numpy as np
+
+        self.n_features = n_features
+        self.weights = np.zeros((len(CLASSES), n_features), dtype=np.float32)
+        self.bias = np.zeros(len(CLASSES), dtype=np.float32)
+        self.examples_seen = 0
+        self.trained_through_id = 0  # highest emails.id learned from
+
+    def predict_proba(self, indices, values):
+        import numpy as np
+
+        scores = self.weights[:, indices] @ values + self.bias
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, indices, values) -> Prediction:
+        proba = self.predict_proba(indices, values)
+        best = int(proba.argmax())
+        label, subtype = CLASSES[best]
+        return Prediction(label, subtype, float(proba[best]))
+
+    def partial_fit(self, examples, epochs=1, learning_rate=LEARNING_RATE, seed=0):
+        """SGD over [(indices, values, class_index)]; can be called again as new labels arrive."""
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch)
+            for position in rng.permutation(len(examples)):
+                indices, values, target = examples[position]
+                gradient = self.predict_proba(indices, values)
+                gradient[target] -= 1.0
+                self.weights[:, indices] -= rate * np.outer(gradient, values)
+                self.bias -= rate * gradient
+        self.examples_seen += len(examples)
+        return self
+
+    def save(self, path=MODEL_PATH):
+        import numpy as np
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f, weights=self.weights, bias=self.bias, classes=np.array(["/".join(c) for c in CLASSES]),
+                examples_seen=self.examples_seen, trained_through_id=self.trained_through_id,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        import numpy as np
+
+        with np.load(path) as data:
+            if [tuple(c.split("/")) for c in data["classes"]] != CLASSES:
+                raise ValueError("saved local triage model was trained on a different label set")
+            model = cls.__new__(cls)
+            model.weights = data["weights"]
+            model.bias = data["bias"]
+            model.n_features = model.weights.shape[1]
+            model.examples_seen = int(data["examples_seen"])
+            model.trained_through_id = int(data["trained_through_id"])
+        return model
+
+
+def labeled_examples(after_id=0, before_id=None):
+    """
+    Training examples [(email_id, (indices, values, class_index))] from emails the
+    LLM triaged: rows labeled by header rules or by this model are left out.
+    """
+    with session_scope() as db:
+        query = db.query(Email.id, Email.subject, Email.from_addr, Email.body,
+                         Email.triage_label, Email.triage_subtype).filter(
+            Email.id > after_id, Email.triage_label.isnot(None), Email.triage_rule.is_(None)
+        )
+        if before_id is not None:
+            query = query.filter(Email.id < before_id)
+        rows = query.order_by(Email.id).all()
+
+    examples = []
+    for email_id, subject, sender, body, label, subtype in rows:
+        target = _CLASS_INDEX.get((label, subtype))
+        if target is not None:
+            examples.append((email_id, (*email_features(subject, sender, body), target)))
+    return examples
+
+
+_lock = threading.Lock()
+_model = None
+_loaded = False
+
+
+def get_model():
+    """The saved model, loaded once; None if none has been trained yet."""
+    global _model, _loaded
+    with _lock:
+        if not _loaded:
+            _loaded = True
+            if MODEL_PATH.exists():
+                try:
+                    _model = LocalTriageModel.load(MODEL_PATH)
+                except Exception as e:
+                    print(f"⚠️ Could not load local triage model: {e}")
+        return _model
+
+
+def _publish(model):
+    global _model, _loaded
+    model.save(MODEL_PATH)
+    with _lock:
+        _model, _loaded = model, True
+
+
+def train(examples=None, save=True):
+    """Trains a fresh model on every LLM-labeled email (or the given examples)."""
+    examples = labeled_examples() if examples is None else examples
+    model = LocalTriageModel().partial_fit([example for _, example in examples], epochs=TRAIN_EPOCHS)
+    model.trained_through_id = max((email_id for email_id, _ in examples), default=0)
+    if save:
+        _publish(model)
+    return model
+
+
+def update():
+    """
+    Learns from emails labeled since the last training run; trains from scratch
+    once MIN_EXAMPLES labels exist if there is no model yet. Returns the number
+    of new examples used.
+    """
+    model = get_model()
+    if model is None:
+        examples = labeled_examples()
+        if len(examples) < MIN_EXAMPLES:
+            return 0
+        train(examples)
+        return len(examples)
+
+    examples = labeled_examples(after_id=model.trained_through_id)
+    if not examples:
+        return 0
+    # Train a copy so concurrent predictions never see a half-updated model
+    updated = LocalTriageModel.__new__(LocalTriageModel)
+    updated.__dict__.update(model.__dict__, weights=model.weights.copy(), bias=model.bias.copy())
+    updated.partial_fit([example for _, example in examples], epochs=UPDATE_EPOCHS,
+                        learning_rate=LEARNING_RATE / 2, seed=model.examples_seen)
+    updated.trained_through_id = examples[-1][0]
+    _publish(updated)
+    return len(examples)
+
+
+def confident_prediction(subject, sender, body) -> Prediction | None:
+    """
+    The local model's triage if it is trusted for this email, otherwise None
+    (the caller then asks the LLM).
+    """
+    if not ENABLED:
+        return None
+    model = get_model()
+    if model is None or model.examples_seen < MIN_EXAMPLES:
+        return None
+    prediction = model.predict(*email_features(subject, sender, body))
+    if prediction.confidence < MIN_CONFIDENCE or prediction.subtype in TIME_SENSITIVE_SUBTYPES:
+        metrics.incr("local_triage.forwarded")
+        return None
+    metrics.incr("local_triage.hits")
+    return prediction
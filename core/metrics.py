@@ -0,0 +1,33 @@
+"""Thread-safe, process-wide counters for LLM usage and pipeline statistics."""
+
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def incr(name: str, amount: float = 1) -> None:
+    with _lock:
+        _counters[name] += amount
+
+
+def get(name: str) -> float:
+    with _lock:
+        return _counters[name]
+
+
+def snapshot(prefix: str = "") -> dict:
+    """Returns a copy of all counters whose name starts with `prefix`."""
+    with _lock:
+        return {name: value for name, value in _counters.items() if name.startswith(prefix)}
+
+
+def record_llm_usage(response, model: str = "unknown") -> None:
+    """Adds the token usage reported on a LangChain chat response to the llm.* counters."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    tokens = usage.get("total_tokens") or 0
+    incr("llm.calls")
+    incr("llm.tokens", tokens)
+    incr(f"llm.{model}.calls")
+    incr(f"llm.{model}.tokens", tokens)
@@ -0,0 +1,179 @@
+"""
+Two-tier model cascade for triage calls: the small model answers first, and only
+items it is unsure about (or answered with invalid output) go to the large model.
+
+Confidence comes from self-consistency (agreement between several sampled small
+model answers) or, for backends that return them, from the answer's token logprobs.
+"""
+
+import logging
+import math
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from core import llm_registry, metrics
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TRIAGE_CASCADE", "").lower() in ("1", "true", "yes")
+# "self_consistency" or "logprob"
+CONFIDENCE_METHOD = os.getenv("CASCADE_CONFIDENCE", "self_consistency").lower()
+# Small-model samples per request for self-consistency (sent in parallel)
+SAMPLES = int(os.getenv("CASCADE_SAMPLES", "3"))
+# Items below this confidence are escalated. For self-consistency the default escalates
+# on any disagreement between samples; 0.66 would accept a 2-of-3 majority.
+MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.9" if CONFIDENCE_METHOD == "logprob" else "1.0"))
+
+SMALL_ROLE = "triage_small"
+LARGE_ROLE = "triage_large"
+
+_sample_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cascade")
+
+
+def _triage_vote(answer):
+    return answer["label"], answer["subtype"]
+
+
+def _logprob_tokens(response):
+    logprobs = response.response_metadata.get("logprobs")
+    return logprobs.get("content") if isinstance(logprobs, dict) else logprobs
+
+
+def _logprob_confidences(response, answers, vote):
+    """
+    {key: confidence} from token logprobs: the least likely token among those that
+    spell an item's voted fields (label and subtype), found after the item's key in
+    the response, so one long batch answer is not penalized for its length.
+    """
+    tokens = _logprob_tokens(response)
+    spans, offset = [], 0
+    for token in tokens:
+        spans.append((offset, offset + len(token["token"]), math.exp(token["logprob"])))
+        offset += len(token["token"])
+    text = "".join(token["token"] for token in tokens).lower()
+    overall = min(probability for _, _, probability in spans)
+
+    confidences = {}
+    for key, answer in answers.items():
+        position = 0 if len(answers) == 1 else text.find(f'"{str(key).lower()}"')
+        probabilities = []
+        for value in vote(answer):
+            position = text.find(str(value).lower(), max(position, 0)) if position >= 0 else -1
+            if position < 0:
+                break
+            end = position + len(str(value))
+            probabilities += [p for start, stop, p in spans if start < end and stop > position]
+            position = end
+        # Fall back to the least likely token of the whole answer if the item cannot be located
+        confidences[key] = min(probabilities) if position >= 0 and probabilities else overall
+    return confidences
+
+
+def _sample(messages, bind_kwargs):
+    # Samples must not come from the cache, or every one would be the same answer
+    return llm_registry.invoke(SMALL_ROLE, messages, use_cache=False, **bind_kwargs)
+
+
+def _small_tier(keys, messages, parse, vote, bind_kwargs):
+    """{key: (answer, confidence)} for the keys the small model answered validly."""
+    if CONFIDENCE_METHOD == "logprob":
+        try:
+            # Cached responses carry no logprobs
+            response = llm_registry.invoke(SMALL_ROLE, messages, use_cache=False, logprobs=True, **bind_kwargs)
+            has_logprobs = bool(_logprob_tokens(response))
+        except Exception as e:
+            logger.warning(f"Cascade: logprob request failed ({e})")
+            has_logprobs = False
+        if has_logprobs:
+            answers = parse(response.content, keys)
+            confidences = _logprob_confidences(response, answers, vote)
+            return {key: (answer, confidences[key]) for key, answer in answers.items()}
+        logger.warning("Cascade: no logprobs from the small model → using self-consistency")
+
+    samples = max(SAMPLES, 1)
+    futures = [_sample_pool.submit(_sample, messages, bind_kwargs) for _ in range(samples)]
+    parsed = []
+    for future in futures:
+        try:
+            parsed.append(parse(future.result().content, keys))
+        except Exception as e:
+            logger.warning(f"Cascade: small model sample failed: {e}")
+
+    results = {}
+    for key in keys:
+        answers = [answers[key] for answers in parsed if key in answers]
+        if not answers:
+            continue
+        (winner, votes), = Counter(vote(answer) for answer in answers).most_common(1)
+        # Invalid or missing samples count against the majority
+        results[key] = (next(a for a in answers if vote(a) == winner), votes / samples)
+    return results
+
+
+def run(keys, build_messages, parse, label="triage", vote=_triage_vote, **bind_kwargs):
+    """
+    Answers every key with the small model and escalates the uncertain ones.
+
+    `build_messages(keys)` builds the request for a subset of the keys, and
+    `parse(text, keys)` returns {key: answer} holding only schema-valid answers.
+    Returns {key: answer}; keys neither tier answered validly are left out.
+    """
+    keys = list(keys)
+    started = time.perf_counter()
+    try:
+        small = _small_tier(keys, build_messages(keys), parse, vote, bind_kwargs)
+    except Exception as e:
+        logger.warning(f"Cascade {label}: small model failed ({e}) → escalating everything")
+        small = {}
+    small_seconds = time.perf_counter() - started
+
+    answers = {key: answer for key, (answer, confidence) in small.items() if confidence >= MIN_CONFIDENCE}
+    invalid = [key for key in keys if key not in small]
+    unsure = [key for key in keys if key in small and key not in answers]
+    escalate = invalid + unsure
+
+    metrics.incr(f"cascade.{label}.items", len(keys))
+    metrics.incr(f"cascade.{label}.small.calls")
+    metrics.incr(f"cascade.{label}.small.seconds", small_seconds)
+    metrics.incr(f"cascade.{label}.escalated", len(escalate))
+    metrics.incr(f"cascade.{label}.escalated.invalid", len(invalid))
+    metrics.incr(f"cascade.{label}.escalated.low_confidence", len(unsure))
+
+    large_seconds = 0.0
+    if escalate:
+        started = time.perf_counter()
+        try:
+            response = llm_registry.invoke(LARGE_ROLE, build_messages(escalate), **bind_kwargs)
+            answers.update(parse(response.content, escalate))
+        except Exception as e:
+            logger.warning(f"Cascade {label}: large model failed: {e}")
+        large_seconds = time.perf_counter() - started
+        metrics.incr(f"cascade.{label}.large.calls")
+        metrics.incr(f"cascade.{label}.large.seconds", large_seconds)
+        # The small model's majority beats no answer at all
+        for key in unsure:
+            answers.setdefault(key, small[key][0])
+
+    logger.info(
+        f"Cascade {label}: {len(keys)} item(s), small tier {small_seconds:.2f}s, "
+        f"{len(escalate)} escalated ({len(invalid)} invalid, {len(unsure)} low confidence)"
+        + (f", large tier {large_seconds:.2f}s" if escalate else "")
+    )
+    return answers
+
+
+def stats(label="triage") -> dict:
+    """Escalation rate and mean latency per tier since the process started."""
+    counters = metrics.snapshot(f"cascade.{label}.")
+
+    def get(name):
+        return counters.get(f"cascade.{label}.{name}", 0)
+
+    return {
+        "items": get("items"),
+        "escalation_rate": get("escalated") / get("items") if get("items") else 0.0,
+        "small_seconds_avg": get("small.seconds") / get("small.calls") if get("small.calls") else None,
+        "large_seconds_avg": get("large.seconds") / get("large.calls") if get("large.calls") else None,
+    }
@@ -0,0 +1,152 @@
+"""Background delivery of queued outgoing email with retry, backoff and a per-mailbox send rate limit."""
+
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from googleapiclient.errors import HttpError
+
+from core.database import (
+    claim_outbox_message,
+    complete_outbox_message,
+    enqueue_outbox,
+    fail_outbox_message,
+    requeue_stale_outbox,
+    retry_outbox_message,
+)
+from core.email_service import deliver_email
+
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "900"))
+SENDS_PER_MINUTE = float(os.getenv("OUTBOX_SENDS_PER_MINUTE", "20"))
+POLL_SECONDS = 5
+STALE_CLAIM = timedelta(minutes=10)
+REQUEUE_EVERY_SECONDS = 60  # how often claims left behind by a dead worker are returned to the queue
+
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded", "backendError"}
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with equal jitter: half the capped delay is fixed, half is random."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(attempt - 1, 0))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _error_reasons(error: HttpError) -> set:
+    try:
+        payload = json.loads(error.content)
+    except (TypeError, ValueError):
+        return set()
+    return {item.get("reason") for item in payload.get("error", {}).get("errors", []) if isinstance(item, dict)}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Gmail 429/5xx and 403 quota errors, plus network failures, are worth retrying."""
+    if isinstance(error, HttpError):
+        if error.resp.status in _RETRYABLE_STATUS:
+            return True
+        return error.resp.status == 403 and bool(_error_reasons(error) & _RATE_LIMIT_REASONS)
+    return isinstance(error, (OSError, TimeoutError))
+
+
+class OutboxWorker(threading.Thread):
+    """
+    Claims queued messages one at a time and delivers them with `deliver`
+    (to, subject, body) -> gmail id. Sends per mailbox are spaced at least
+    60 / SENDS_PER_MINUTE seconds apart.
+    """
+
+    def __init__(self, deliver=deliver_email, sends_per_minute=SENDS_PER_MINUTE):
+        super().__init__(name="outbox-worker", daemon=True)
+        self.deliver = deliver
+        self.min_spacing = 60 / sends_per_minute if sends_per_minute > 0 else 0
+        self._last_send = {}  # mailbox -> monotonic time of the last send attempt
+        self._wake = threading.Event()
+        # Not `_stop`: that would shadow threading.Thread._stop(), which join() calls
+        self._stop_event = threading.Event()
+        self._next_requeue = 0.0
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def _wait_for_rate_limit(self, mailbox):
+        last = self._last_send.get(mailbox)
+        if last is not None:
+            time.sleep(max(0.0, last + self.min_spacing - time.monotonic()))
+        self._last_send[mailbox] = time.monotonic()
+
+    def process(self, message) -> str:
+        """Attempts delivery of one claimed message and returns its new status."""
+        self._wait_for_rate_limit(message["mailbox"])
+        try:
+            gmail_id = self.deliver(message["to_addr"], message["subject"], message["body"])
+        except Exception as e:
+            attempts = (message["attempts"] or 0) + 1
+            if is_retryable(e) and attempts < MAX_ATTEMPTS:
+                delay = backoff_delay(attempts)
+                retry_outbox_message(message["id"], str(e), datetime.now(timezone.utc) + timedelta(seconds=delay))
+                print(f"⚠️ Outbox #{message['id']} to {message['to_addr']} failed ({e}) → retry in {delay:.0f}s")
+                return "queued"
+            fail_outbox_message(message["id"], str(e))
+            print(f"❌ Outbox #{message['id']} to {message['to_addr']} failed permanently: {e}")
+            return "failed"
+
+        complete_outbox_message(message["id"], gmail_id)
+        print(f"✅ Outbox #{message['id']} delivered to {message['to_addr']}")
+        return "sent"
+
+    def drain(self) -> int:
+        """Delivers every message that is currently due; returns how many were processed."""
+        processed = 0
+        while not self._stop_event.is_set():
+            message = claim_outbox_message()
+            if message is None:
+                return processed
+            self.process(message)
+            processed += 1
+        return processed
+
+    def _requeue_stale(self):
+        if time.monotonic() >= self._next_requeue:
+            requeue_stale_outbox(datetime.now(timezone.utc) - STALE_CLAIM)
+            self._next_requeue = time.monotonic() + REQUEUE_EVERY_SECONDS
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._requeue_stale()
+                self.drain()
+            except Exception as e:
+                print(f"❌ Outbox worker error: {e}")
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def ensure_worker() -> OutboxWorker:
+    """Starts this process's outbox worker on first use and returns it."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = OutboxWorker()
+            _worker.start()
+        return _worker
+
+
+def queue_email(mailbox, to_addr, subject, body, email_id=None) -> int:
+    """Persists a message to the outbox and wakes the worker; returns the outbox id."""
+    message_id = enqueue_outbox(mailbox, to_addr, subject, body, email_id)
+    ensure_worker().wake()
+    return message_id
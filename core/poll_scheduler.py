@@ -0,0 +1,115 @@
+"""Adaptive polling: the poll interval follows each mailbox's observed arrival rate."""
+
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from core.database import get_poll_state, recent_arrivals, record_arrivals, save_poll_state
+from core.settings_store import get_timezone
+
+MIN_INTERVAL = int(os.getenv("POLL_MIN_SECONDS", "60"))
+MAX_INTERVAL = int(os.getenv("POLL_MAX_SECONDS", "3600"))
+# Aim for roughly this many new messages per poll
+TARGET_MESSAGES_PER_POLL = float(os.getenv("POLL_TARGET_MESSAGES", "1"))
+# Arrivals are weighted by exp(-age / RATE_DECAY): recent bursts dominate the estimate
+RATE_DECAY = timedelta(hours=float(os.getenv("POLL_RATE_DECAY_HOURS", "0.5")))
+RATE_WINDOW = RATE_DECAY * 6
+BUSINESS_HOURS = (9, 18)  # local time, Monday–Friday
+BUSINESS_HOURS_FACTOR = 0.5
+# Delay before retrying a failed poll, doubled after each further failure in a row
+RETRY_INTERVAL = int(os.getenv("POLL_RETRY_SECONDS", "120"))
+
+
+def _utcnow():
+    # Stored timestamps are naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def estimate_rate(arrivals, now) -> float:
+    """Exponentially decayed arrival rate in messages per hour."""
+    tau = RATE_DECAY.total_seconds()
+    weight = sum(math.exp(-max((now - ts).total_seconds(), 0) / tau) for ts in arrivals)
+    return weight / (tau / 3600)
+
+
+def in_business_hours(now_utc) -> bool:
+    local = now_utc.replace(tzinfo=timezone.utc).astimezone(get_timezone())
+    return local.weekday() < 5 and BUSINESS_HOURS[0] <= local.hour < BUSINESS_HOURS[1]
+
+
+def next_interval(rate_per_hour, empty_polls, business_hours) -> int:
+    """
+    Seconds until the next poll, clamped to [MIN_INTERVAL, MAX_INTERVAL].
+
+    Starts from the expected time for TARGET_MESSAGES_PER_POLL to arrive, backs off
+    exponentially (MIN_INTERVAL * 2^n) after n consecutive empty polls, and polls
+    twice as often during business hours.
+    """
+    interval = 3600 * TARGET_MESSAGES_PER_POLL / rate_per_hour if rate_per_hour > 0 else MAX_INTERVAL
+    if empty_polls:
+        interval = max(interval, MIN_INTERVAL * 2 ** min(empty_polls, 16))
+    if business_hours:
+        interval *= BUSINESS_HOURS_FACTOR
+    return int(min(max(interval, MIN_INTERVAL), MAX_INTERVAL))
+
+
+def retry_interval(failures) -> int:
+    """Seconds until a failed poll is retried: RETRY_INTERVAL * 2^(n-1), at most MAX_INTERVAL."""
+    return int(min(RETRY_INTERVAL * 2 ** min(max(failures - 1, 0), 16), MAX_INTERVAL))
+
+
+class AdaptivePoller:
+    """
+    Polls one mailbox with `poll()` (returning the newly ingested email records)
+    and reschedules itself from the arrival timestamps those records carry.
+
+    `poll()` must raise when the fetch fails: a failed poll is not an empty one, so
+    it leaves the arrival rate and empty-poll backoff alone and is retried after
+    `retry_interval()` instead.
+    """
+
+    def __init__(self, mailbox, poll):
+        self.mailbox = mailbox
+        self.poll = poll
+        self.failures = 0  # consecutive failed polls
+
+    def poll_once(self) -> dict:
+        records = self.poll()
+        now = _utcnow()
+
+        arrivals = [
+            datetime.fromisoformat(r["received_at"]).astimezone(timezone.utc).replace(tzinfo=None)
+            for r in records if r.get("received_at")
+        ]
+        record_arrivals(self.mailbox, arrivals, keep_since=now - RATE_WINDOW)
+
+        state = get_poll_state(self.mailbox) or {}
+        empty_polls = 0 if records else (state.get("empty_polls") or 0) + 1
+        rate = estimate_rate(recent_arrivals(self.mailbox, now - RATE_WINDOW), now)
+        interval = next_interval(rate, empty_polls, in_business_hours(now))
+
+        save_poll_state(
+            self.mailbox,
+            interval_seconds=interval,
+            arrival_rate=round(rate, 3),
+            empty_polls=empty_polls,
+            last_poll_at=now,
+            next_poll_at=now + timedelta(seconds=interval),
+        )
+        print(f"⏱ {self.mailbox}: {len(records)} new | ~{rate:.2f} msgs/hour | next poll in {interval}s")
+        return get_poll_state(self.mailbox)
+
+    def run_forever(self):
+        while True:
+            state = get_poll_state(self.mailbox)
+            if state and state["next_poll_at"]:
+                time.sleep(max((state["next_poll_at"] - _utcnow()).total_seconds(), 0))
+            try:
+                self.poll_once()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                delay = retry_interval(self.failures)
+                print(f"❌ Poll failed for {self.mailbox} ({self.failures} in a row): {e} | retrying in {delay}s")
+                time.sleep(delay)
@@ -0,0 +1,102 @@
+"""Gmail push notifications: users.watch → Pub/Sub push → incremental sync of the notified mailbox."""
+
+import base64
+import json
+import os
+import threading
+
+from core.database import get_history_id
+from core.email_service import fetch_emails, get_gmail_service
+from core.settings_store import get_settings
+
+# Shared secret expected as ?token=... on the push endpoint URL (empty = not checked)
+VERIFICATION_TOKEN = os.getenv("PUSH_VERIFICATION_TOKEN", "")
+
+_lock = threading.Lock()
+_running = set()  # mailboxes with a sync thread in flight
+_pending = set()  # mailboxes notified again while their sync was running
+
+
+def register_watch(topic_name: str, label_ids=("INBOX",)) -> dict:
+    """
+    Starts (or renews) Gmail push notifications to a Pub/Sub topic.
+
+    Watches expire after 7 days, so call this at least weekly (daily is typical).
+    Returns Gmail's {"historyId", "expiration"} response.
+    """
+    body = {"topicName": topic_name, "labelIds": list(label_ids), "labelFilterBehavior": "include"}
+    return get_gmail_service().users().watch(userId="me", body=body).execute()
+
+
+def build_push_envelope(email_address: str, history_id, message_id: str = "local-test") -> dict:
+    """Builds a Pub/Sub push request body carrying a Gmail notification (used by the local stand-in publisher)."""
+    data = json.dumps({"emailAddress": email_address, "historyId": int(history_id)}).encode("utf-8")
+    return {
+        "message": {"data": base64.b64encode(data).decode("ascii"), "messageId": message_id},
+        "subscription": "projects/local/subscriptions/gmail-push",
+    }
+
+
+def parse_push_envelope(envelope) -> dict:
+    """
+    Decodes a Pub/Sub push request body into Gmail's {"emailAddress", "historyId"}
+    notification (historyId as an int). Raises ValueError for anything malformed.
+    """
+    message = envelope.get("message") if isinstance(envelope, dict) else None
+    data = message.get("data") if isinstance(message, dict) else None
+    if not data or not isinstance(data, str):
+        raise ValueError("Push envelope has no message data")
+    try:
+        notification = json.loads(base64.b64decode(data + "=" * (-len(data) % 4)))
+    except ValueError as e:  # also covers binascii and JSON decoding errors
+        raise ValueError(f"Undecodable push message data: {e}") from e
+
+    email_address = notification.get("emailAddress") if isinstance(notification, dict) else None
+    history_id = notification.get("historyId") if isinstance(notification, dict) else None
+    if not isinstance(email_address, str) or not email_address:
+        raise ValueError(f"Not a Gmail notification: {notification}")
+    if isinstance(history_id, bool) or not isinstance(history_id, (int, str)) or not str(history_id).isdigit():
+        raise ValueError(f"Invalid historyId in Gmail notification: {history_id!r}")
+    return {"emailAddress": email_address, "historyId": int(history_id)}
+
+
+def handle_notification(notification: dict) -> bool:
+    """
+    Schedules an incremental sync for the notified mailbox and returns immediately.
+
+    Notifications for other mailboxes, or at or below the stored checkpoint, are
+    ignored. A notification that arrives while a sync is running queues exactly
+    one follow-up sync, so bursts coalesce instead of piling up threads.
+    """
+    monitored_email = get_settings().monitored_email
+    if not monitored_email or notification["emailAddress"].lower() != monitored_email.lower():
+        print(f"⚠️ Push for unmonitored mailbox {notification['emailAddress']} → ignoring")
+        return False
+
+    checkpoint = get_history_id(monitored_email)
+    if checkpoint and int(notification["historyId"]) <= int(checkpoint):
+        return False
+
+    with _lock:
+        if monitored_email in _running:
+            _pending.add(monitored_email)
+            return True
+        _running.add(monitored_email)
+
+    threading.Thread(target=_sync_until_idle, args=(monitored_email,), daemon=True).start()
+    return True
+
+
+def _sync_until_idle(mailbox):
+    while True:
+        try:
+            emails = fetch_emails(incremental=True)
+            print(f"📬 Push sync for {mailbox}: {len(emails)} new email(s)")
+        except Exception as e:
+            print(f"❌ Push sync failed for {mailbox}: {e}")
+        with _lock:
+            if mailbox in _pending:
+                _pending.discard(mailbox)
+                continue
+            _running.discard(mailbox)
+            return
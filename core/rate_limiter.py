@@ -0,0 +1,174 @@
+"""Token-bucket limits on LLM requests and tokens per minute, shared by every process through one SQLite file."""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from core import metrics
+from core.database import DATA_DIR
+
+ENABLED = os.getenv("LLM_RATE_LIMIT_DISABLED", "").lower() not in ("1", "true", "yes")
+# Give up (raise RateLimitTimeout) if a call would have to queue longer than this
+MAX_WAIT_SECONDS = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "600"))
+# Longest single sleep while queued, so waiters re-check buckets refilled or refunded by others
+POLL_SECONDS = 2.0
+
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when a call could not get through the limiter within its maximum wait."""
+
+
+class TokenBucketLimiter:
+    """
+    Two token buckets per key (usually a model name): one holding requests, one
+    holding LLM tokens, each refilling continuously up to its per-minute limit.
+
+    State lives in SQLite and every update runs in a BEGIN IMMEDIATE
+    transaction, so the Flask app, the LangGraph run and scripts started
+    separately all draw from the same buckets.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _transaction(self):
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            self._ensure_schema(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def _ensure_schema(self, conn):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS buckets ("
+                        " key TEXT PRIMARY KEY,"
+                        " requests REAL NOT NULL, tokens REAL NOT NULL,"
+                        " requests_per_minute REAL NOT NULL, tokens_per_minute REAL NOT NULL,"
+                        " blocked_until REAL NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+                    )
+                    self._ready = True
+
+    @staticmethod
+    def _refilled(row, rpm, tpm, now):
+        """Bucket levels at `now`; a missing row starts full."""
+        if row is None:
+            return float(rpm), float(tpm), 0.0
+        requests, tokens, blocked_until, updated_at = row
+        elapsed = max(0.0, now - updated_at)
+        return (
+            min(rpm, requests + elapsed * rpm / 60),
+            min(tpm, tokens + elapsed * tpm / 60),
+            blocked_until,
+        )
+
+    def _save(self, conn, key, requests, tokens, rpm, tpm, blocked_until, now):
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets"
+            " (key, requests, tokens, requests_per_minute, tokens_per_minute, blocked_until, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, requests, tokens, rpm, tpm, blocked_until, now),
+        )
+
+    def try_acquire(self, key: str, rpm: float, tpm: float, tokens: int) -> float:
+        """Takes one request and `tokens` tokens if both are available; otherwise returns seconds until they should be."""
+        now = time.time()
+        needed = min(tokens, tpm)  # a prompt bigger than a full bucket may still go once the bucket is full
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT requests, tokens, blocked_until, updated_at FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            requests, available, blocked_until = self._refilled(row, rpm, tpm, now)
+            if blocked_until > now:
+                wait = blocked_until - now
+            elif requests >= 1 and available >= needed:
+                requests, available, wait = requests - 1, available - needed, 0.0
+            else:
+                wait = max((1 - requests) * 60 / rpm, (needed - available) * 60 / tpm, 0.0)
+            self._save(conn, key, requests, available, rpm, tpm, blocked_until, now)
+        return wait
+
+    def acquire(self, key: str, rpm: float, tpm: float, tokens: int, max_wait: float = MAX_WAIT_SECONDS) -> float:
+        """Blocks until the call fits in both buckets and returns the seconds spent waiting."""
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(key, rpm, tpm, tokens)
+            waited = time.monotonic() - start
+            if wait <= 0:
+                if waited > 0:
+                    metrics.incr("rate_limiter.queued")
+                    metrics.incr("rate_limiter.wait_seconds", waited)
+                return waited
+            if waited + wait > max_wait:
+                metrics.incr("rate_limiter.timeouts")
+                raise RateLimitTimeout(f"{key}: rate limit wait of {wait:.0f}s exceeds {max_wait:.0f}s")
+            time.sleep(min(wait, POLL_SECONDS) + random.uniform(0, 0.05))
+
+    def adjust(self, key: str, rpm: float, tpm: float, tokens: float) -> None:
+        """Charges (positive) or refunds (negative) tokens once a call's real usage is known."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT requests, tokens, blocked_until, updated_at FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            requests, available, blocked_until = self._refilled(row, rpm, tpm, now)
+            # May go negative: the overdraft is paid back by refill before the next call
+            self._save(conn, key, requests, min(tpm, available - tokens), rpm, tpm, blocked_until, now)
+
+    def block(self, key: str, rpm: float, tpm: float, seconds: float) -> None:
+        """Holds every caller for `key` back for `seconds` (the provider said we are over its limit)."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT requests, tokens, blocked_until, updated_at FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            requests, available, blocked_until = self._refilled(row, rpm, tpm, now)
+            self._save(conn, key, requests, available, rpm, tpm, max(blocked_until, now + seconds), now)
+        metrics.incr("rate_limiter.provider_429")
+
+    def status(self) -> list[dict]:
+        """Current level of every bucket, refilled to now."""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT key, requests, tokens, blocked_until, updated_at, requests_per_minute, tokens_per_minute"
+                " FROM buckets ORDER BY key"
+            ).fetchall()
+        result = []
+        for key, requests, tokens, blocked_until, updated_at, rpm, tpm in rows:
+            requests, tokens, blocked_until = self._refilled((requests, tokens, blocked_until, updated_at), rpm, tpm, now)
+            result.append({
+                "key": key,
+                "requests_available": round(requests, 2),
+                "requests_per_minute": rpm,
+                "tokens_available": round(tokens),
+                "tokens_per_minute": tpm,
+                "blocked_for_seconds": round(max(0.0, blocked_until - now), 1),
+            })
+        return result
+
+    def reset(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM buckets")
+
+
+limiter = TokenBucketLimiter(DATA_DIR / "rate_limits.db")
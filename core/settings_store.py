@@ -0,0 +1,92 @@
+"""Typed, cached access to .secrets/settings.json, re-read only when the file's mtime changes."""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "../.secrets/settings.json")
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+
+
+class FileCache:
+    """
+    Holds the parsed contents of one file and re-parses it only when its
+    (mtime, size) stamp changes, so hot paths pay a stat() instead of open+parse.
+    """
+
+    def __init__(self, path, parser, default):
+        self.path = path
+        self.parser = parser
+        self.default = default
+        self._lock = threading.Lock()
+        self._stamp = object()  # never equal to a real stamp → first get() always loads
+        self._value = None
+
+    def get(self):
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        with self._lock:
+            if stamp != self._stamp:
+                self._value = self.parser(self.path) if stamp else self.default()
+                self._stamp = stamp
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._stamp = object()
+
+
+@dataclass(frozen=True)
+class Settings:
+    monitored_email: str = ""
+    timezone: str = DEFAULT_TIMEZONE
+    raw: dict = field(default_factory=dict)
+
+    @property
+    def tzinfo(self):
+        return get_timezone(self.timezone)
+
+
+def _parse_settings(path):
+    with open(path, "r") as file:
+        raw = json.load(file)
+    return Settings(
+        monitored_email=raw.get("monitored_email", ""),
+        timezone=raw.get("timezone", DEFAULT_TIMEZONE),
+        raw=raw,
+    )
+
+
+_settings = FileCache(SETTINGS_FILE, _parse_settings, Settings)
+
+
+def get_settings() -> Settings:
+    return _settings.get()
+
+
+def load_settings() -> dict:
+    """Returns a copy of the raw settings dict (callers may mutate it and pass it to save_settings)."""
+    return dict(get_settings().raw)
+
+
+def save_settings(settings: dict) -> None:
+    with open(SETTINGS_FILE, "w") as file:
+        json.dump(settings, file, indent=4)
+    _settings.invalidate()
+
+
+@lru_cache(maxsize=16)
+def _timezone(name: str):
+    import pytz
+
+    return pytz.timezone(name)
+
+
+def get_timezone(name: str = None):
+    """Returns the pytz timezone for `name` (default: the configured timezone), built once per name."""
+    return _timezone(name or get_settings().timezone)
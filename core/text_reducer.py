@@ -0,0 +1,175 @@
+"""Shrinks raw email bodies into compact prompt input: HTML → text, minus quoted history, signatures and boilerplate."""
+
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+from core import metrics
+
+# Elements whose content never carries message text
+_SKIP_TAGS = {"script", "style", "head", "title", "noscript", "template", "svg"}
+_BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "ul", "ol", "table", "section", "article", "header",
+    "footer", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr",
+}
+_MAX_LINK_LENGTH = 120  # longer hrefs are almost always tracking redirects
+
+# A reply header ("On Mon, Jun 2, 2025 at 10:00 AM Jane <j@x.com> wrote:") may wrap onto two lines
+_QUOTE_HEADER = re.compile(r"^\s*On\s.{0,200}?\bwrote:\s*$", re.IGNORECASE | re.MULTILINE | re.DOTALL)
+_QUOTE_MARKERS = re.compile(
+    r"^\s*(-{2,}\s*Original Message\s*-{2,}|-{2,}\s*Forwarded message\s*-{2,}|_{10,}|From:\s.+\n\s*(Sent|Date):\s)",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Only the RFC 3676 "-- " delimiter (with its trailing space): a bare "--" line is often a separator in prose
+_SIGNATURE_MARKERS = re.compile(r"^(-- \r?|Sent from my \w+.*|Get Outlook for \w+.*)$", re.IGNORECASE | re.MULTILINE)
+_BOILERPLATE = re.compile(
+    r"(unsubscribe|no longer wish to receive|manage (your )?(email )?preferences|view (this email )?in (your )?browser"
+    r"|this (e-?mail|message) (and any attachments )?(is|are|may be) (confidential|privileged|intended)"
+    r"|all rights reserved|privacy policy|you (are )?receiv(ed|ing) this (e-?mail|message))",
+    re.IGNORECASE,
+)
+_FOOTER_LINE_CHARS = 200  # longer lines are message text, even when they mention a privacy policy
+
+
+@dataclass
+class ReducedText:
+    text: str
+    tokens_before: int
+    tokens_after: int
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self._skip_depth = 0
+        self._href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append("\n")
+        if tag == "a":
+            href = dict(attrs).get("href") or ""
+            self._href = href if href.startswith("http") and len(href) <= _MAX_LINK_LENGTH else None
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append("\n")
+        if tag == "a" and self._href:
+            self.chunks.append(f" ({self._href})")
+            self._href = None
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chunks.append(data)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for Llama-family tokenizers)."""
+    return (len(text) + 3) // 4
+
+
+def html_to_text(html: str) -> str:
+    """Converts HTML into compact plain text, keeping short links inline."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    lines = (re.sub(r"[ \t\u00a0\u200c]+", " ", line).strip() for line in "".join(parser.chunks).splitlines())
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def strip_quoted_history(text: str) -> str:
+    """Cuts the quoted reply chain ("On … wrote:", "Original Message", "> " lines)."""
+    cut = len(text)
+    for pattern in (_QUOTE_HEADER, _QUOTE_MARKERS):
+        match = pattern.search(text)
+        if match and match.start() > 0:
+            cut = min(cut, match.start())
+    text = text[:cut]
+    return "\n".join(line for line in text.splitlines() if not line.lstrip().startswith(">")).strip()
+
+
+def _is_footer_line(line: str) -> bool:
+    line = line.strip()
+    return not line or (len(line) <= _FOOTER_LINE_CHARS and bool(_BOILERPLATE.search(line)))
+
+
+def strip_signature(text: str) -> str:
+    """
+    Drops the signature block and the trailing footer: the run of short boilerplate
+    lines (legal notices, unsubscribe links) at the end. The same phrases inside the
+    message itself are kept, and the first line is never treated as footer.
+    """
+    match = _SIGNATURE_MARKERS.search(text)
+    if match and match.start() > 0:
+        text = text[:match.start()]
+    lines = text.rstrip().splitlines()
+    end = len(lines)
+    while end > 1 and _is_footer_line(lines[end - 1]):
+        end -= 1
+    return "\n".join(lines[:end]).strip()
+
+
+def reduce_text(content: str) -> str:
+    """
+    Reduces an email body (HTML or plain text) to the text worth sending to an LLM.
+
+    Falls back to the unstripped text if stripping would leave nothing (e.g. a bare forward).
+    """
+    content = content or ""
+    text = html_to_text(content) if re.search(r"<[a-zA-Z][^>]*>", content) else content.strip()
+    return strip_signature(strip_quoted_history(text)) or text
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_oversized(block: str, max_tokens: int) -> list[str]:
+    """Splits one block that is too big on its own: by lines, then sentences, then hard character cuts."""
+    for pattern in (re.compile(r"\n"), _SENTENCE_END):
+        pieces = [piece for piece in pattern.split(block) if piece.strip()]
+        if len(pieces) > 1:
+            return [part for piece in pieces for part in
+                    ([piece] if estimate_tokens(piece) <= max_tokens else _split_oversized(piece, max_tokens))]
+    width = max_tokens * 4
+    return [block[start:start + width] for start in range(0, len(block), width)]
+
+
+def split_into_chunks(text: str, max_tokens: int) -> list[str]:
+    """
+    Splits text into chunks of at most ~max_tokens, breaking on paragraph
+    boundaries where possible (then lines, then sentences) and packing
+    consecutive paragraphs together so chunks stay close to the limit.
+    """
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        if not paragraph.strip():
+            continue
+        blocks.extend([paragraph] if estimate_tokens(paragraph) <= max_tokens else _split_oversized(paragraph, max_tokens))
+
+    chunks, current = [], ""
+    for block in blocks:
+        candidate = f"{current}\n\n{block}" if current else block
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def reduce_for_prompt(content: str) -> ReducedText:
+    """Like reduce_text, but reports before/after token counts and records them in core.metrics."""
+    content = content or ""
+    reduced = reduce_text(content)
+
+    result = ReducedText(reduced, estimate_tokens(content), estimate_tokens(reduced))
+    metrics.incr("reducer.tokens_before", result.tokens_before)
+    metrics.incr("reducer.tokens_after", result.tokens_after)
+    return result
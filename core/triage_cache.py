@@ -0,0 +1,65 @@
+"""Content-addressed cache of summaries and triage results for repeated (near-)identical emails."""
+
+import hashlib
+import os
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from core.cache_store import SQLiteLRUCache
+from core.database import DATA_DIR
+from core.text_reducer import reduce_text
+
+# Bump whenever the summarizer or classifier prompt (or the key normalization) changes so stale results stop matching
+PROMPT_VERSION = "2"
+CACHE_ENABLED = os.getenv("TRIAGE_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+_cache = SQLiteLRUCache(
+    DATA_DIR / "triage_cache.db",
+    name="triage_cache",
+    max_entries=int(os.getenv("TRIAGE_CACHE_MAX_ENTRIES", "10000")),
+)
+
+_URL_QUERY = re.compile(r"(https?://[^\s?#)]+)\?([^\s#)]*)")
+# Only these are dropped; every other parameter (tokens, order ids) stays part of the key
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_hsenc|_hsmi|mkt_tok|trk|ref|cmpid)$")
+
+
+def _drop_tracking_params(match) -> str:
+    params = [(k, v) for k, v in parse_qsl(match.group(2), keep_blank_values=True) if not _TRACKING_PARAMS.match(k)]
+    return f"{match.group(1)}?{urlencode(params)}" if params else match.group(1)
+
+
+def normalize_content(content: str) -> str:
+    """
+    Canonical form used for hashing: reduced text, lowercased, with known tracking
+    parameters (utm_*, fbclid, ...) and whitespace differences removed. Ids, tokens
+    and other query parameters are kept: the cached summary quotes them.
+    """
+    text = reduce_text(content).lower()
+    text = _URL_QUERY.sub(_drop_tracking_params, text)
+    return " ".join(text.split())
+
+
+def content_key(content: str, model: str) -> str:
+    digest = hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+    return f"{model}:{PROMPT_VERSION}:{digest}"
+
+
+def lookup(content: str, model: str) -> dict | None:
+    """Returns {"summary": ..., "triage": {...}} for previously seen content, else None."""
+    if not CACHE_ENABLED or not content:
+        return None
+    return _cache.get(content_key(content, model))
+
+
+def store(content: str, model: str, summary: str, triage: dict) -> None:
+    if CACHE_ENABLED and content:
+        _cache.set(content_key(content, model), {"summary": summary, "triage": triage})
+
+
+def stats() -> dict:
+    return _cache.stats()
+
+
+def clear() -> None:
+    _cache.clear()
@@ -1,25 +1,38 @@
 import json
 from typing import TypedDict, Literal
 from langgraph.graph import END, StateGraph
-from core.email_service import fetch_emails
-from core.email_classifier import classify_email
+from core.email_service import fetch_emails, retriage_pending
+from core.database import init_db
+from core import local_triage
 
 
 def process_emails(state):
-    """Fetches emails and prepares them for classification."""
+    """Fetches emails added since the last sync and prepares them for classification."""
     try:
-        emails = fetch_emails()
-        if not emails:
-            print("⚠ No new emails found.")
-            return {"emails": []}  # No emails fetched
-        return {"emails": emails}
+        init_db()
+        emails = fetch_emails(incremental=True, minutes_since=state.get("minutes_since"))
     except Exception as e:
         print(f"❌ Error fetching emails: {e}")
         return {"emails": []}  # Return an empty list on failure
 
+    # Housekeeping must not discard the emails that were just fetched and stored
+    try:
+        retriage_pending()
+        local_triage.update()
+    except Exception as e:
+        print(f"⚠ Post-fetch maintenance failed: {e}")
+
+    if not emails:
+        print("⚠ No new emails found.")
+        return {"emails": []}  # No emails fetched
+    return {"emails": emails}
+
 
 def classify_emails(state):
-    """Classifies emails using LLaMA 3.2."""
+    """
+    Attaches the triage each email got while it was fetched (header rules, local
+    model, triage cache or the LLM); emails are not sent to the LLM a second time.
+    """
     classified_emails = []
     for email in state["emails"]:
         summary = email.get("summary", "").strip()
@@ -27,8 +40,11 @@ def classify_emails(state):
             print(f"⚠ Skipping email from {email['from_email']} (No summary available)")
             continue  # Skip emails without summaries
 
-        classification = classify_email(summary)
-        email["classification"] = classification
+        email["classification"] = {
+            "label": email["classification"],
+            "subtype": email["subtype"],
+            "due_time": email.get("due_time"),
+        }
         classified_emails.append(email)
 
     return {"emails": classified_emails}
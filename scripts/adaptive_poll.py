@@ -0,0 +1,30 @@
+"""Poll the monitored mailbox on an interval that adapts to its traffic (for setups without Gmail push)."""
+import argparse
+
+from core.database import get_poll_state, init_db
+from core.email_service import fetch_emails
+from core.poll_scheduler import AdaptivePoller
+from core.settings_store import get_settings
+from core.startup import warm_up
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adaptive polling loop for the monitored mailbox.")
+    parser.add_argument("--status", action="store_true", help="Print the current interval and arrival rate and exit.")
+
+    args = parser.parse_args()
+    init_db()
+    mailbox = get_settings().monitored_email
+    if not mailbox:
+        raise SystemExit("❌ No monitored email set.")
+
+    if args.status:
+        state = get_poll_state(mailbox)
+        if not state:
+            print(f"⚠ {mailbox} has not been polled yet.")
+        else:
+            print(f"📫 {mailbox}: every {state['interval_seconds']}s | ~{state['arrival_rate']:.2f} msgs/hour | "
+                  f"{state['empty_polls']} empty poll(s) in a row | next poll {state['next_poll_at']:%Y-%m-%d %H:%M:%S} UTC")
+    else:
+        warm_up()
+        AdaptivePoller(mailbox, poll=lambda: fetch_emails(incremental=True, raise_errors=True)).run_forever()
@@ -0,0 +1,25 @@
+"""Backfill the monitored mailbox page by page; safe to stop and re-run."""
+import argparse
+
+from core.database import init_db
+from core.email_service import backfill_mailbox
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest an existing inbox through the email pipeline.")
+    parser.add_argument("--page-size", type=int, default=100, help="Messages per messages.list page (max 500).")
+    parser.add_argument("--batch-size", type=int, default=25, help="Messages pushed through the pipeline at once.")
+    parser.add_argument("--max-pages", type=int, default=None, help="Stop after this many pages in this run.")
+    parser.add_argument("--restart", action="store_true", help="Discard the saved cursor and start from the newest mail.")
+
+    args = parser.parse_args()
+    init_db()
+    state = backfill_mailbox(
+        page_size=args.page_size,
+        batch_size=args.batch_size,
+        max_pages=args.max_pages,
+        restart=args.restart,
+    )
+    if state:
+        status = "completed" if state["completed"] else "paused"
+        print(f"✅ Backfill {status}: {state['pages_done']} pages, {state['messages_done']} messages ingested.")
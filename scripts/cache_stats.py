@@ -0,0 +1,25 @@
+"""Show (or clear) the on-disk LLM response and triage caches shared by every process."""
+import argparse
+
+from core import llm_registry, triage_cache
+
+
+CACHES = {
+    "llm": (llm_registry.cache_stats, llm_registry.clear_cache),
+    "triage": (triage_cache.stats, triage_cache.clear),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the shared LLM response and triage caches.")
+    parser.add_argument("--clear", action="store_true", help="Drop every cached entry and reset the hit counters.")
+
+    args = parser.parse_args()
+    for name, (stats, clear) in CACHES.items():
+        if args.clear:
+            clear()
+            print(f"✅ {name} cache cleared.")
+            continue
+        s = stats()
+        print(f"🗄 {name}: {s['entries']} entries | {s['total_hits']} hits / {s['total_misses']} misses "
+              f"| hit rate {s['total_hit_rate']:.0%}")
@@ -0,0 +1,76 @@
+"""Train the local triage model from stored LLM labels and report how well it agrees with them."""
+import argparse
+import time
+
+from core import local_triage
+from core.database import init_db
+
+
+def evaluate(model, examples, min_confidence):
+    """Agreement with the LLM labels, overall and on the emails the model would have kept off the LLM."""
+    label_hits = subtype_hits = kept = kept_hits = 0
+    started = time.perf_counter()
+    for _, (indices, values, target) in examples:
+        prediction = model.predict(indices, values)
+        label, subtype = local_triage.CLASSES[target]
+        label_hits += prediction.label == label
+        subtype_hits += prediction.subtype == subtype
+        if prediction.confidence >= min_confidence and prediction.subtype not in local_triage.TIME_SENSITIVE_SUBTYPES:
+            kept += 1
+            kept_hits += prediction.subtype == subtype
+    elapsed = time.perf_counter() - started
+    total = len(examples)
+    return {
+        "emails": total,
+        "label_accuracy": label_hits / total,
+        "subtype_accuracy": subtype_hits / total,
+        "coverage": kept / total,
+        "accuracy_when_confident": kept_hits / kept if kept else None,
+        "predict_microseconds": elapsed / total * 1e6,
+    }
+
+
+def print_report(report, min_confidence):
+    print(f"📊 {report['emails']} held-out emails")
+    print(f"   label accuracy:   {report['label_accuracy']:.1%}")
+    print(f"   subtype accuracy: {report['subtype_accuracy']:.1%}")
+    confident = report["accuracy_when_confident"]
+    print(f"   confident (≥ {min_confidence:.2f}): {report['coverage']:.1%} of emails would skip the LLM, "
+          f"{'n/a' if confident is None else f'{confident:.1%}'} of them agreeing with it")
+    print(f"   prediction time:  {report['predict_microseconds']:.0f} µs per email (after feature hashing)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and evaluate the local (NumPy) triage model.")
+    parser.add_argument("--update", action="store_true", help="Only learn from emails labeled since the last run.")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="Share of the newest LLM-labeled emails held out for evaluation (default 0.2).")
+    parser.add_argument("--min-confidence", type=float, default=local_triage.MIN_CONFIDENCE,
+                        help="Confidence at which predictions are trusted (default LOCAL_TRIAGE_MIN_CONFIDENCE).")
+    parser.add_argument("--dry-run", action="store_true", help="Evaluate only; do not save a model.")
+
+    args = parser.parse_args()
+    init_db()
+
+    if args.update:
+        learned = local_triage.update()
+        print(f"✅ Local triage model updated with {learned} new email(s).")
+        raise SystemExit(0)
+
+    examples = local_triage.labeled_examples()
+    if not examples:
+        print("⚠ No LLM-labeled emails to train on yet.")
+        raise SystemExit(1)
+
+    split = int(len(examples) * (1 - args.holdout))
+    if 0 < split < len(examples):
+        started = time.perf_counter()
+        model = local_triage.train(examples[:split], save=False)
+        print(f"🧠 Trained on {split} emails in {time.perf_counter() - started:.1f}s")
+        print_report(evaluate(model, examples[split:], args.min_confidence), args.min_confidence)
+    else:
+        print("⚠ Too few emails for a held-out evaluation.")
+
+    if not args.dry_run:
+        model = local_triage.train(examples)
+        print(f"💾 Saved model trained on all {len(examples)} emails to {local_triage.MODEL_PATH}")
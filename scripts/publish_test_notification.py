@@ -0,0 +1,17 @@
+"""Local stand-in for Pub/Sub: POST a Gmail push notification to the webhook receiver."""
+import argparse
+
+import httpx
+
+from core.push_notifications import build_push_envelope
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a fake Gmail push notification to a local endpoint.")
+    parser.add_argument("--email", required=True, help="Mailbox the notification is for (the monitored email).")
+    parser.add_argument("--history-id", type=int, required=True, help="historyId to report; must be above the stored checkpoint.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/gmail/push", help="Push endpoint URL (add ?token=... if set).")
+
+    args = parser.parse_args()
+    response = httpx.post(args.url, json=build_push_envelope(args.email, args.history_id), timeout=10)
+    print(f"➡ {args.url} responded {response.status_code}")
@@ -0,0 +1,22 @@
+"""Show (or reset) the shared LLM rate-limit buckets used by every process."""
+import argparse
+
+from core.rate_limiter import limiter
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the cross-process Groq rate limiter.")
+    parser.add_argument("--reset", action="store_true", help="Forget all bucket state (next calls start with full buckets).")
+
+    args = parser.parse_args()
+    if args.reset:
+        limiter.reset()
+        print("✅ Rate-limit buckets reset.")
+    else:
+        buckets = limiter.status()
+        if not buckets:
+            print("⚠ No LLM calls have gone through the limiter yet.")
+        for bucket in buckets:
+            blocked = f" | ⏸ blocked {bucket['blocked_for_seconds']}s" if bucket["blocked_for_seconds"] else ""
+            print(f"🪣 {bucket['key']}: {bucket['requests_available']}/{bucket['requests_per_minute']:.0f} requests, "
+                  f"{bucket['tokens_available']}/{bucket['tokens_per_minute']:.0f} tokens available{blocked}")
@@ -0,0 +1,15 @@
+"""Register (or renew) Gmail push notifications for the monitored mailbox. Re-run daily; watches expire after 7 days."""
+import argparse
+from datetime import datetime, timezone
+
+from core.push_notifications import register_watch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start Gmail push notifications to a Pub/Sub topic.")
+    parser.add_argument("--topic", required=True, help="Full topic name, e.g. projects/my-project/topics/gmail-push")
+
+    args = parser.parse_args()
+    response = register_watch(args.topic)
+    expires = datetime.fromtimestamp(int(response["expiration"]) / 1000, tz=timezone.utc)
+    print(f"✅ Watching INBOX (historyId {response['historyId']}), expires {expires:%Y-%m-%d %H:%M} UTC.")
@@ -0,0 +1,20 @@
+"""Deliver queued outgoing email (run alongside or instead of the worker thread the Flask app starts)."""
+import argparse
+
+from core.database import init_db
+from core.outbox_worker import OutboxWorker
+from core.startup import warm_up
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Outbox delivery worker.")
+    parser.add_argument("--once", action="store_true", help="Deliver whatever is due right now, then exit.")
+
+    args = parser.parse_args()
+    init_db()
+    worker = OutboxWorker()
+    if args.once:
+        print(f"📤 Processed {worker.drain()} outbox message(s).")
+    else:
+        warm_up(llm_roles=())
+        worker.run()
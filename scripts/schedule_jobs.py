@@ -16,9 +16,11 @@ async def is_server_running(url: str) -> bool:
         return False
 
 
-async def main(url: Optional[str] = None, minutes_since: int = 60):
-    """Creates a cron job to fetch emails every 10 minutes."""
+async def main(url: Optional[str] = None, minutes_since: int = 60, push: bool = False):
+    """Creates a cron job to fetch emails every 10 minutes (hourly safety net in push mode)."""
     api_url = url or "http://127.0.0.1:2024"
+    # With Gmail push registered, polling only has to catch dropped notifications
+    schedule, every = ("0 * * * *", "hour") if push else ("*/10 * * * *", "10 minutes")
 
     # Check if LangGraph server is running
     if not await is_server_running(api_url):
@@ -33,10 +35,10 @@ async def main(url: Optional[str] = None, minutes_since: int = 60):
     try:
         response = await client.crons.create(
             "workflow_manager",  # ✅ Ensure this matches your LangGraph workflow name
-            schedule="*/10 * * * *",  # Runs every 10 minutes
+            schedule=schedule,
             input={"minutes_since": minutes_since}
         )
-        print(f"✅ Cron job scheduled successfully! Runs every 10 minutes.")
+        print(f"✅ Cron job scheduled successfully! Runs every {every}.")
     except Exception as e:
         print(f"❌ Failed to schedule cron job: {e}")
 
@@ -45,6 +47,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Set up automated email fetching every 10 minutes.")
     parser.add_argument("--url", type=str, default=None, help="API URL to use for scheduling the job.")
     parser.add_argument("--minutes-since", type=int, default=60, help="Only process emails newer than this time.")
+    parser.add_argument("--push", action="store_true", help="Gmail push is active; poll hourly as a safety net only.")
 
     args = parser.parse_args()
-    asyncio.run(main(url=args.url, minutes_since=args.minutes_since))
+    asyncio.run(main(url=args.url, minutes_since=args.minutes_since, push=args.push))
@@ -0,0 +1,127 @@
+# tests/test_batch_triage.py
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.messages import AIMessage
+
+from core import email_classifier, llm_registry
+from core.email_classifier import TRIAGE_PROMPT_TEMPLATE, classify_emails_batch
+from core.ingest_pipeline import IngestPipeline
+
+
+class FakeTriageModel:
+    """Answers batch prompts with `batch_answer(ids)` and single prompts with a MEETING_INVITE."""
+
+    def __init__(self, batch_answer):
+        self.batch_answer = batch_answer
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def invoke(self, role, messages, use_cache=True, **bind_kwargs):
+        prompt = messages[0]["content"]
+        if "EMAILS TO TRIAGE" in prompt:
+            self.batch_calls += 1
+            ids = [json.loads(line)["id"] for line in prompt.splitlines() if line.startswith('{"id"')]
+            return AIMessage(content=self.batch_answer(ids))
+        self.single_calls += 1
+        return AIMessage(content='{"label": "email", "subtype": "MEETING_INVITE"}')
+
+
+def _results(ids, subtype="PROMOTION"):
+    return json.dumps({"results": [{"id": i, "label": "no", "subtype": subtype} for i in ids]})
+
+
+def test_single_prompt_template_formats():
+    prompt = TRIAGE_PROMPT_TEMPLATE.format(email_content="Lunch on Friday?")
+    assert "Lunch on Friday?" in prompt
+    assert '"label": "<email | notify | no>"' in prompt
+
+
+def test_batch_maps_results_back_by_id(monkeypatch):
+    model = FakeTriageModel(lambda ids: _results(reversed(ids)))
+    monkeypatch.setattr(llm_registry, "invoke", model.invoke)
+
+    results = classify_emails_batch(["sale one", "sale two", "sale three"])
+    assert [r["subtype"] for r in results] == ["PROMOTION"] * 3
+    assert (model.batch_calls, model.single_calls) == (1, 0)
+
+
+def test_missing_duplicate_and_invalid_ids_fall_back_per_item(monkeypatch):
+    def answer(ids):
+        first, second, third, fourth = ids
+        return json.dumps({"results": [
+            {"id": first, "label": "no", "subtype": "PROMOTION"},
+            {"id": second, "label": "no", "subtype": "PROMOTION"},
+            {"id": second, "label": "no", "subtype": "SPAM"},
+            {"id": third, "label": "no", "subtype": "NOT_A_SUBTYPE"},
+            {"id": "e99", "label": "no", "subtype": "SPAM"},
+        ]})
+
+    model = FakeTriageModel(answer)
+    monkeypatch.setattr(llm_registry, "invoke", model.invoke)
+
+    results = classify_emails_batch(["a", "b", "c", "d"])
+    assert [r["subtype"] for r in results] == ["PROMOTION", "MEETING_INVITE", "MEETING_INVITE", "MEETING_INVITE"]
+    assert model.single_calls == 3
+
+
+def test_unparseable_batch_falls_back_to_single_calls(monkeypatch):
+    model = FakeTriageModel(lambda ids: "Sure! Here are the labels you asked for.")
+    monkeypatch.setattr(llm_registry, "invoke", model.invoke)
+
+    results = classify_emails_batch(["a", "", "b"])
+    assert results[1] == {"label": "notify", "subtype": "UPCOMING_EVENT"}
+    assert [results[0]["subtype"], results[2]["subtype"]] == ["MEETING_INVITE", "MEETING_INVITE"]
+    assert (model.batch_calls, model.single_calls) == (1, 2)
+
+
+def test_batches_respect_size_limit(monkeypatch):
+    model = FakeTriageModel(_results)
+    monkeypatch.setattr(llm_registry, "invoke", model.invoke)
+    monkeypatch.setattr(email_classifier, "TRIAGE_BATCH_SIZE", 3)
+
+    assert len(classify_emails_batch([f"sale {i}" for i in range(7)])) == 7
+    assert (model.batch_calls, model.single_calls) == (2, 1)
+
+
+def test_fetch_time_batches_use_the_classifier_model_and_prompt(monkeypatch):
+    from core import email_service
+
+    roles = []
+
+    def invoke(role, messages, use_cache=True, **bind_kwargs):
+        roles.append(role)
+        return AIMessage(content=_results(
+            [json.loads(line)["id"] for line in messages[0]["content"].splitlines() if line.startswith('{"id"')]
+        ))
+
+    monkeypatch.setattr(llm_registry, "invoke", invoke)
+    monkeypatch.setattr(email_classifier.model_cascade, "ENABLED", False)
+    results = email_service.classify_summaries(["- 40% off shoes", "- Flash sale ends tonight"])
+    assert [r["subtype"] for r in results] == ["PROMOTION", "PROMOTION"]
+    assert roles == ["classifier"]
+    assert email_service.CLASSIFIER_INSTRUCTIONS.startswith(email_service.CLASSIFIER_TASK)
+
+
+def test_pipeline_classifies_each_fetch_batch_together():
+    batches = []
+
+    def classify_batch(items):
+        batches.append([item["id"] for item in items])
+        return [{"label": "no", "subtype": "SPAM"} for _ in items]
+
+    pipeline = IngestPipeline(
+        fetch=lambda ids: {i: {"id": i} for i in ids if i != "m3"},
+        summarize=lambda item: f"summary of {item['id']}",
+        classify=None,
+        persist=lambda item: (item["id"], item["triage"]["subtype"]),
+        fetch_batch_size=2,
+        classify_batch=classify_batch,
+    )
+    records = pipeline.run(["m1", "m2", "m3", "m4", "m5"])
+    assert records == [("m1", "SPAM"), ("m2", "SPAM"), ("m4", "SPAM"), ("m5", "SPAM")]
+    assert batches == [["m1", "m2"], ["m4"], ["m5"]]
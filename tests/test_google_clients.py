@@ -0,0 +1,72 @@
+# tests/test_google_clients.py
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import googleapiclient.discovery
+
+from core import google_clients
+
+
+class FakeCredentials:
+    def __init__(self, expiry):
+        self.refresh_token = "refresh"
+        self.token = "old"
+        self.expiry = expiry
+        self.valid = True
+
+    def refresh(self, request):
+        self.token = "new"
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    def to_json(self):
+        return "{}"
+
+
+def _in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_new_threads_reuse_clients_built_by_finished_threads(monkeypatch):
+    built = []
+    monkeypatch.setattr(googleapiclient.discovery, "build", lambda *args, **kwargs: built.append(object()) or built[-1])
+    monkeypatch.setattr(google_clients, "_credentials", {"me": FakeCredentials(datetime.utcnow() + timedelta(hours=1))})
+    monkeypatch.setattr(google_clients, "_refresher", object())
+    monkeypatch.setattr(google_clients, "_idle", {})
+
+    first = _in_thread(lambda: google_clients.get_service("gmail", "v1"))
+    second = _in_thread(lambda: google_clients.get_service("gmail", "v1"))
+    assert first is second
+    assert len(built) == 1
+
+
+def _lock_is_free():
+    if not google_clients._lock.acquire(timeout=1):
+        return False
+    google_clients._lock.release()
+    return True
+
+
+def test_refresh_does_not_hold_the_lock_during_the_network_call(monkeypatch):
+    monkeypatch.setattr(google_clients, "_save", lambda creds: None)
+    monkeypatch.setattr(google_clients, "_request", lambda: None)
+    lock_free = []
+
+    class SlowCredentials(FakeCredentials):
+        def refresh(self, request):
+            # Other threads can still take the lock while the token request is in flight
+            lock_free.append(_in_thread(_lock_is_free))
+            super().refresh(request)
+
+    creds = SlowCredentials(datetime.utcnow())
+    google_clients._refresh(creds)
+    assert lock_free == [True]
+    assert creds.token == "new"
@@ -0,0 +1,46 @@
+# tests/test_header_rules.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.header_rules import confident_match, triage_from_headers
+
+
+def test_gmail_promotions_category():
+    match = triage_from_headers({"Subject": "Sale"}, ["INBOX", "CATEGORY_PROMOTIONS"], "deals@shop.com")
+    assert (match.label, match.subtype, match.rule) == ("no", "PROMOTION", "gmail_category_promotions")
+
+
+def test_social_sender_domain():
+    match = triage_from_headers({}, ["INBOX"], "notification@facebookmail.com")
+    assert (match.label, match.subtype) == ("no", "SOCIAL")
+
+
+def test_agreeing_rules_reinforce_each_other():
+    headers = {"List-Unsubscribe": "<mailto:u@x.com>", "Precedence": "bulk"}
+    match = triage_from_headers(headers, ["INBOX"], "news@brand.com")
+    assert match.rule == "precedence_bulk+list_unsubscribe"
+    assert match.confidence > 0.85
+    assert confident_match(headers, ["INBOX"], "news@brand.com") is not None
+
+
+def test_list_unsubscribe_alone_is_deferred_to_llm():
+    headers = {"List-Unsubscribe": "<mailto:u@x.com>"}
+    assert triage_from_headers(headers, ["INBOX"], "billing@bank.com").confidence < 0.85
+    assert confident_match(headers, ["INBOX"], "billing@bank.com") is None
+
+
+def test_sender_domain_alone_is_deferred_to_llm():
+    assert confident_match({}, ["INBOX"], "security@linkedin.com") is None
+    assert confident_match({}, ["INBOX"], "bounce@mcsv.net") is None
+
+    headers = {"List-Unsubscribe": "<mailto:u@x.com>"}
+    assert confident_match(headers, ["INBOX"], "notification@facebookmail.com").subtype == "SOCIAL"
+    assert confident_match(headers, ["INBOX"], "bounce@mcsv.net").subtype == "PROMOTION"
+    assert confident_match({}, ["INBOX", "CATEGORY_SOCIAL"], "notification@facebookmail.com").subtype == "SOCIAL"
+
+
+def test_personal_mail_has_no_match():
+    assert triage_from_headers({"Subject": "Lunch?"}, ["INBOX", "IMPORTANT"], "friend@gmail.com") is None
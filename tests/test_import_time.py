@@ -0,0 +1,36 @@
+# tests/test_import_time.py
+
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Seconds allowed for `import ui.app` in a fresh interpreter (override on slow CI machines)
+IMPORT_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "1.5"))
+
+# Modules that must only load when something actually uses them
+LAZY_MODULES = ["ollama", "langchain_groq", "groq", "googleapiclient.discovery", "google_auth_oauthlib", "markdown", "numpy"]
+
+PROBE = f"""
+import sys, time
+start = time.perf_counter()
+import ui.app
+elapsed = time.perf_counter() - start
+import core.database
+print(repr((elapsed, core.database._engine is None, [m for m in {LAZY_MODULES!r} if m in sys.modules])))
+"""
+
+
+def _import_app():
+    env = dict(os.environ, GROQ_API_KEY=os.getenv("GROQ_API_KEY", "test"))
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return ast.literal_eval(result.stdout.strip().splitlines()[-1])
+
+
+def test_app_import_defers_heavy_work():
+    elapsed, engine_deferred, loaded = _import_app()
+    assert engine_deferred, "importing the app must not create the database engine"
+    assert loaded == [], f"heavy modules imported eagerly: {loaded}"
+    assert elapsed < IMPORT_BUDGET, f"import ui.app took {elapsed:.2f}s (budget {IMPORT_BUDGET}s)"
@@ -0,0 +1,95 @@
+# tests/test_ingest_pipeline.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from sqlalchemy import create_engine
+
+from core import database, email_service
+from core.database import Email, get_history_id, session_scope
+from core.ingest_pipeline import IngestPipeline
+
+
+def _flaky_fetch(failing):
+    def fetch(ids):
+        if failing & set(ids):
+            raise ConnectionError("batch request failed")
+        return {i: {"id": i} for i in ids}
+    return fetch
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_failed_fetch_batch_keeps_earlier_and_later_work(batched):
+    stored = {}
+
+    def persist(item):
+        if item["id"] in stored:
+            return None
+        stored[item["id"]] = item["triage"]
+        return item["id"]
+
+    def pipeline(fetch):
+        return IngestPipeline(
+            fetch=fetch,
+            summarize=lambda item: f"summary of {item['id']}",
+            classify=lambda item: "SPAM",
+            persist=persist,
+            fetch_batch_size=2,
+            classify_batch=(lambda items: ["SPAM"] * len(items)) if batched else None,
+        )
+
+    ids = ["m1", "m2", "m3", "m4", "m5", "m6"]
+    first = pipeline(_flaky_fetch({"m4"}))
+    assert first.run(ids) == ["m1", "m2", "m5", "m6"]
+    assert first.unfetched == ["m3", "m4"]
+
+    # Retrying the whole list stores only what is missing, each message once
+    retry = pipeline(_flaky_fetch(set()))
+    assert retry.run(ids) == ["m3", "m4"]
+    assert retry.unfetched == []
+    assert sorted(stored) == ids
+
+
+@pytest.fixture
+def memory_db():
+    previous = database._engine
+    database.set_engine(create_engine("sqlite://", future=True))
+    database.init_db(force=True)
+    yield
+    database.set_engine(previous)
+
+
+def test_fetch_emails_stores_other_batches_and_keeps_checkpoint(memory_db, monkeypatch):
+    ids = [f"m{i:02d}" for i in range(25)]
+    failing = {"m12"}
+
+    def batch_get_messages(service, message_ids):
+        if failing & set(message_ids):
+            raise ConnectionError("batch request failed")
+        return {i: {"id": i, "payload": {"headers": [{"name": "Subject", "value": i}]}} for i in message_ids}
+
+    monkeypatch.setattr(email_service, "get_gmail_service", lambda: None)
+    monkeypatch.setattr(email_service, "load_settings", lambda: {"monitored_email": "me@example.com"})
+    monkeypatch.setattr(email_service, "incremental_message_ids", lambda service, mailbox, minutes: (ids, "h2"))
+    monkeypatch.setattr(email_service, "batch_get_messages", batch_get_messages)
+    monkeypatch.setattr(email_service, "summarize_item", lambda item: f"summary of {item['subject']}")
+    monkeypatch.setattr(email_service, "classify_item", lambda item: {"label": "no", "subtype": "PROMOTION"})
+    monkeypatch.setattr(email_service, "BATCH_TRIAGE", False)
+
+    def stored_ids():
+        with session_scope() as db:
+            return [gmail_id for (gmail_id,) in db.query(Email.gmail_id).order_by(Email.id)]
+
+    records = email_service.fetch_emails(incremental=True, raise_errors=True)
+    assert [r["subject"] for r in records] == ids[:10] + ids[20:]
+    assert stored_ids() == ids[:10] + ids[20:]
+    assert get_history_id("me@example.com") is None
+
+    failing.clear()
+    records = email_service.fetch_emails(incremental=True, raise_errors=True)
+    assert [r["subject"] for r in records] == ids[10:20]
+    assert sorted(stored_ids()) == ids
+    assert get_history_id("me@example.com") == "h2"
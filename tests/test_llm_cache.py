@@ -0,0 +1,44 @@
+# tests/test_llm_cache.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.messages import AIMessage
+
+from core import llm_registry
+from core.cache_store import SQLiteLRUCache
+
+
+class FakeBackend:
+    name = "groq"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, config, messages, bind_kwargs=None):
+        self.calls += 1
+        return AIMessage(content="Thanks, see you Friday.")
+
+
+def test_repeated_invoke_is_counted_as_a_hit(monkeypatch, tmp_path):
+    backend = FakeBackend()
+    path = tmp_path / "llm_cache.db"
+    monkeypatch.setattr(llm_registry, "_cache", SQLiteLRUCache(path, name="llm_cache_test"))
+    monkeypatch.setattr(llm_registry, "CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_registry, "get_backends", lambda role: [backend])
+
+    messages = [{"role": "user", "content": "Reply to: lunch on Friday?"}]
+    first = llm_registry.invoke("drafter", messages)
+    second = llm_registry.invoke("drafter", messages)
+
+    assert backend.calls == 1
+    assert not first.response_metadata.get("cached")
+    assert second.response_metadata["cached"] and second.content == first.content
+    stats = llm_registry.cache_stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+    # Another process opening the same file sees the same totals
+    shared = SQLiteLRUCache(path, name="llm_cache_other").stats()
+    assert (shared["total_hits"], shared["total_misses"], shared["hits"]) == (1, 1, 0)
@@ -0,0 +1,85 @@
+# tests/test_llm_router.py
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from core import llm_backends
+
+
+class StandIn:
+    """Local stand-in for an LLM backend: answers after `delay` seconds, or raises `error`."""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return AIMessage(content=f"answer from {self.name}")
+
+    def stream(self, messages):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        for word in ("hello ", "from ", self.name):
+            yield AIMessageChunk(content=word)
+
+
+@pytest.fixture(autouse=True)
+def fresh_latency(monkeypatch):
+    monkeypatch.setattr(llm_backends, "latency", llm_backends.LatencyTracker())
+
+
+def test_primary_serves_when_healthy():
+    groq, ollama = StandIn("groq"), StandIn("ollama")
+    response = llm_backends.invoke([groq, ollama], lambda b: b.invoke("hi"), label="test")
+    assert response.response_metadata["backend"] == "groq"
+    assert ollama.calls == 0
+
+
+def test_falls_back_on_error_and_tries_failed_backend_last():
+    groq, ollama = StandIn("groq", error=TimeoutError("read timeout")), StandIn("ollama")
+    response = llm_backends.invoke([groq, ollama], lambda b: b.invoke("hi"), label="test")
+    assert response.content == "answer from ollama"
+    assert response.response_metadata["backend"] == "ollama"
+
+    # Within the cooldown the failed backend is no longer asked first
+    llm_backends.invoke([groq, ollama], lambda b: b.invoke("hi"), label="test")
+    assert groq.calls == 1
+
+
+def test_raises_primary_error_when_every_backend_fails():
+    groq = StandIn("groq", error=TimeoutError("groq down"))
+    ollama = StandIn("ollama", error=ConnectionError("ollama down"))
+    with pytest.raises(TimeoutError):
+        llm_backends.invoke([groq, ollama], lambda b: b.invoke("hi"), label="test")
+
+
+def test_hedges_slow_request_after_p95():
+    for _ in range(llm_backends.MIN_SAMPLES_FOR_P95):
+        llm_backends.latency.record("groq:test", 0.05)
+    groq, ollama = StandIn("groq", delay=1.0), StandIn("ollama")
+
+    started = time.monotonic()
+    response = llm_backends.invoke([groq, ollama], lambda b: b.invoke("hi"), label="test", hedge=True)
+    assert response.response_metadata["backend"] == "ollama"
+    assert time.monotonic() - started < 0.5
+
+
+def test_stream_falls_back_before_first_chunk():
+    groq, ollama = StandIn("groq", error=ConnectionError("refused")), StandIn("ollama")
+    parts = list(llm_backends.stream([groq, ollama], lambda b: b.stream("hi"), label="test"))
+    assert {name for name, _ in parts} == {"ollama"}
+    assert "".join(chunk.content for _, chunk in parts) == "hello from ollama"
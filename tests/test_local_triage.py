@@ -0,0 +1,66 @@
+# tests/test_local_triage.py
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import local_triage
+from core.local_triage import CLASSES, LocalTriageModel, features
+
+SAMPLES = {
+    ("no", "PROMOTION"): ("Deals <deals@shop.example>", "Summer sale: 40% off all {x}, shop now before Sunday"),
+    ("notify", "ALERT"): ("Security <noreply@bank.example>", "New sign-in to your account from {x}, review your settings"),
+    ("email", "SUPPORT_ISSUE"): ("Dana <dana@client.example>", "The {x} keeps crashing after login, can you help fix it?"),
+}
+WORDS = ["dashboard", "mobile app", "billing page", "reports", "invoices", "shoes", "Germany", "a new device"]
+
+
+def _examples(count, seed=0):
+    rng = random.Random(seed)
+    examples = []
+    for _ in range(count):
+        pair = rng.choice(list(SAMPLES))
+        sender, text = SAMPLES[pair]
+        body = text.format(x=rng.choice(WORDS))
+        examples.append((*features(body[:30], sender, body), CLASSES.index(pair)))
+    return examples
+
+
+def test_features_are_normalized_and_deterministic():
+    indices, values = features("Hello", "a@b.example", "hello world hello")
+    again_indices, again_values = features("Hello", "a@b.example", "hello world hello")
+    assert (indices == again_indices).all() and (values == again_values).all()
+    assert abs(float((values ** 2).sum()) - 1.0) < 1e-5
+
+
+def test_learns_separable_classes_and_round_trips(tmp_path):
+    model = LocalTriageModel().partial_fit(_examples(300), epochs=3)
+    test = _examples(60, seed=1)
+    correct = sum(model.predict(indices, values).subtype == CLASSES[target][1] for indices, values, target in test)
+    assert correct == len(test)
+
+    path = tmp_path / "model.npz"
+    model.save(path)
+    loaded = LocalTriageModel.load(path)
+    indices, values, _ = test[0]
+    assert loaded.predict(indices, values) == model.predict(indices, values)
+    assert loaded.examples_seen == 300
+
+
+def test_only_confident_trusted_predictions_skip_the_llm(monkeypatch):
+    model = LocalTriageModel().partial_fit(_examples(300), epochs=3)
+    monkeypatch.setattr(local_triage, "get_model", lambda: model)
+    monkeypatch.setattr(local_triage, "MIN_EXAMPLES", 100)
+
+    prediction = local_triage.confident_prediction(
+        "Summer sale", "Deals <deals@shop.example>", "<p>Summer sale: 40% off all shoes, shop now before Sunday</p>"
+    )
+    assert (prediction.label, prediction.subtype) == ("no", "PROMOTION")
+    assert local_triage.confident_prediction("Lunch?", "x@y.example", "are we still on for lunch") is None
+
+    monkeypatch.setattr(local_triage, "MIN_EXAMPLES", 1000)
+    assert local_triage.confident_prediction(
+        "Summer sale", "Deals <deals@shop.example>", "Summer sale: 40% off all shoes, shop now before Sunday"
+    ) is None
@@ -0,0 +1,58 @@
+# tests/test_mime_walker.py
+
+import base64
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from core.email_service import decode_body_data, walk_payload
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode()
+
+
+def test_nested_alternative_inside_mixed():
+    payload = {
+        "mimeType": "multipart/mixed",
+        "parts": [
+            {
+                "mimeType": "multipart/alternative",
+                "parts": [
+                    {"mimeType": "text/plain", "body": {"data": b64("plain body")}},
+                    {"mimeType": "text/html", "body": {"data": b64("<p>html body</p>")}},
+                ],
+            },
+            {"mimeType": "application/pdf", "filename": "invoice.pdf", "body": {"attachmentId": "abc"}},
+        ],
+    }
+    assert walk_payload(payload) == ("plain body", "<p>html body</p>")
+
+
+def test_attachments_are_not_decoded():
+    payload = {
+        "mimeType": "multipart/mixed",
+        "parts": [
+            {"mimeType": "text/plain", "filename": "notes.txt", "body": {"data": "not-base64!!"}},
+            {"mimeType": "text/plain", "body": {"data": b64("the real body")}},
+        ],
+    }
+    assert walk_payload(payload) == ("the real body", "")
+
+
+def test_single_part_message():
+    payload = {"mimeType": "text/plain", "body": {"data": b64("hello")}}
+    assert walk_payload(payload) == ("hello", "")
+
+
+def test_body_is_capped():
+    data = b64("x" * 200_000)
+    assert decode_body_data(data, max_bytes=1000) == "x" * 1000
+    assert decode_body_data(data, max_bytes=10**6) == "x" * 200_000
+
+
+def test_unpadded_data():
+    data = b64("abcde").rstrip("=")
+    assert decode_body_data(data) == "abcde"
@@ -0,0 +1,123 @@
+# tests/test_model_cascade.py
+
+import itertools
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.messages import AIMessage
+
+from core import llm_registry, metrics, model_cascade
+
+
+class FakeModels:
+    """Small model answers cycle through `small_answers`; the large model always says SUPPORT_ISSUE."""
+
+    def __init__(self, small_answers, logprobs=None):
+        self.small_answers = itertools.cycle(small_answers)
+        self.logprobs = logprobs
+        self.calls = {"triage_small": 0, "triage_large": 0}
+
+    def invoke(self, role, messages, use_cache=True, **bind_kwargs):
+        self.calls[role] += 1
+        if role == "triage_large":
+            return AIMessage(content='{"label": "email", "subtype": "SUPPORT_ISSUE"}')
+        metadata = {"logprobs": {"content": self.logprobs}} if bind_kwargs.get("logprobs") and self.logprobs else {}
+        return AIMessage(content=next(self.small_answers), response_metadata=metadata)
+
+
+def _answer(subtype, label="no"):
+    return json.dumps({"label": label, "subtype": subtype})
+
+
+def _parse(text, keys):
+    data = json.loads(text)
+    if data.get("subtype") not in ("SPAM", "PROMOTION", "SUPPORT_ISSUE"):
+        return {}
+    return {0: data}
+
+
+def _run(monkeypatch, models, **settings):
+    monkeypatch.setattr(llm_registry, "invoke", models.invoke)
+    for name, value in settings.items():
+        monkeypatch.setattr(model_cascade, name, value)
+    return model_cascade.run([0], lambda keys: [{"role": "user", "content": "triage"}], _parse, label="test").get(0)
+
+
+def test_agreeing_small_samples_are_not_escalated(monkeypatch):
+    models = FakeModels([_answer("SPAM")])
+    assert _run(monkeypatch, models)["subtype"] == "SPAM"
+    assert models.calls == {"triage_small": 3, "triage_large": 0}
+
+
+def test_disagreement_escalates_to_large_model(monkeypatch):
+    models = FakeModels([_answer("SPAM"), _answer("PROMOTION"), _answer("SUPPORT_ISSUE", "email")])
+    assert _run(monkeypatch, models)["subtype"] == "SUPPORT_ISSUE"
+    assert models.calls["triage_large"] == 1
+
+
+def test_invalid_small_output_escalates(monkeypatch):
+    models = FakeModels(['{"label": "maybe", "subtype": "???"}', "not json at all"])
+    assert _run(monkeypatch, models)["subtype"] == "SUPPORT_ISSUE"
+
+
+def _tokens(*pieces):
+    """(text, logprob) pieces as the small model's content and its token logprobs."""
+    return "".join(text for text, _ in pieces), [{"token": text, "logprob": logprob} for text, logprob in pieces]
+
+
+def test_logprob_confidence(monkeypatch):
+    content, logprobs = _tokens(('{"label": "', -0.001), ("no", -0.01), ('", "subtype": "', -0.001), ("SPAM", -0.02), ('"}', 0.0))
+    sure = FakeModels([content], logprobs=logprobs)
+    assert _run(monkeypatch, sure, CONFIDENCE_METHOD="logprob", MIN_CONFIDENCE=0.9)["subtype"] == "SPAM"
+    assert sure.calls == {"triage_small": 1, "triage_large": 0}
+
+    content, logprobs = _tokens(('{"label": "', -0.001), ("no", -0.01), ('", "subtype": "', -0.001), ("SPAM", -1.5), ('"}', 0.0))
+    unsure = FakeModels([content], logprobs=logprobs)
+    assert _run(monkeypatch, unsure, CONFIDENCE_METHOD="logprob", MIN_CONFIDENCE=0.9)["subtype"] == "SUPPORT_ISSUE"
+
+
+def test_logprob_confidence_is_scored_per_batch_item(monkeypatch):
+    # A long answer of near-certain tokens, with one uncertain subtype for e2
+    pieces = [('{"results": [', -0.001)]
+    for i in range(20):
+        pieces += [(", " if i else "", 0.0), (f'{{"id": "e{i}", "label": "', -0.001), ("no", -0.01),
+                   ('", "subtype": "', -0.001), ("PROMOTION" if i == 2 else "SPAM", -2.0 if i == 2 else -0.02),
+                   ('"}', -0.001)]
+    content, logprobs = _tokens(*pieces, ("]}", 0.0))
+
+    def parse(text, keys):
+        return {entry["id"]: entry for entry in json.loads(text)["results"] if entry["id"] in keys}
+
+    class Models(FakeModels):
+        def invoke(self, role, messages, use_cache=True, **bind_kwargs):
+            assert use_cache is False or role == "triage_large"
+            self.calls[role] += 1
+            if role == "triage_large":
+                keys = messages[0]["content"]
+                return AIMessage(content=json.dumps({"results": [{"id": k, "label": "no", "subtype": "SPAM"} for k in keys]}))
+            return AIMessage(content=content, response_metadata={"logprobs": {"content": logprobs}})
+
+    models = Models([])
+    monkeypatch.setattr(llm_registry, "invoke", models.invoke)
+    monkeypatch.setattr(model_cascade, "CONFIDENCE_METHOD", "logprob")
+    monkeypatch.setattr(model_cascade, "MIN_CONFIDENCE", 0.9)
+    escalated = []
+    answers = model_cascade.run(
+        [f"e{i}" for i in range(20)], lambda keys: escalated.append(list(keys)) or [{"role": "user", "content": keys}],
+        parse, label="test",
+    )
+    assert len(answers) == 20
+    assert escalated[1:] == [["e2"]]
+
+
+def test_escalation_rate_is_tracked(monkeypatch):
+    before = metrics.snapshot("cascade.test.")
+    _run(monkeypatch, FakeModels([_answer("SPAM")]))
+    _run(monkeypatch, FakeModels([_answer("SPAM"), _answer("PROMOTION")]))
+    after = metrics.snapshot("cascade.test.")
+    assert after["cascade.test.items"] - before.get("cascade.test.items", 0) == 2
+    assert after["cascade.test.escalated"] - before.get("cascade.test.escalated", 0) == 1
+    assert model_cascade.stats("test")["large_seconds_avg"] is not None
@@ -0,0 +1,36 @@
+# tests/test_outbox_worker.py
+
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import outbox_worker
+from core.outbox_worker import OutboxWorker
+
+
+def test_worker_starts_stops_and_joins(monkeypatch):
+    requeued = threading.Event()
+    calls = []
+
+    def requeue(claimed_before):
+        calls.append(claimed_before)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        requeued.set()
+        return 0
+
+    monkeypatch.setattr(outbox_worker, "requeue_stale_outbox", requeue)
+    monkeypatch.setattr(outbox_worker, "claim_outbox_message", lambda: None)
+    monkeypatch.setattr(outbox_worker, "POLL_SECONDS", 0.01)
+
+    worker = OutboxWorker(deliver=lambda to, subject, body: "id")
+    worker.start()
+    # A failed requeue at startup is retried on the next cycle instead of killing the thread
+    assert requeued.wait(2)
+    assert worker.is_alive()
+
+    worker.stop()
+    worker.join(2)
+    assert not worker.is_alive()
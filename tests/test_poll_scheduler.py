@@ -0,0 +1,47 @@
+# tests/test_poll_scheduler.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import poll_scheduler
+from core.poll_scheduler import AdaptivePoller, retry_interval
+
+
+class Stop(Exception):
+    pass
+
+
+def test_failed_poll_is_retried_without_counting_as_empty(monkeypatch):
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise Stop
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("a failed poll must not be recorded as an observation")
+
+    def poll():
+        raise ConnectionError("Gmail unavailable")
+
+    monkeypatch.setattr(poll_scheduler, "get_poll_state", lambda mailbox: None)
+    monkeypatch.setattr(poll_scheduler, "record_arrivals", unexpected)
+    monkeypatch.setattr(poll_scheduler, "save_poll_state", unexpected)
+    monkeypatch.setattr(poll_scheduler.time, "sleep", sleep)
+
+    poller = AdaptivePoller("me@example.com", poll)
+    with pytest.raises(Stop):
+        poller.run_forever()
+    assert sleeps == [retry_interval(1), retry_interval(2)]
+    assert poller.failures == 2
+
+
+def test_retry_interval_backs_off_up_to_max(monkeypatch):
+    monkeypatch.setattr(poll_scheduler, "RETRY_INTERVAL", 60)
+    monkeypatch.setattr(poll_scheduler, "MAX_INTERVAL", 600)
+    assert [retry_interval(n) for n in (1, 2, 3, 5)] == [60, 120, 240, 600]
@@ -0,0 +1,56 @@
+# tests/test_retriage.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from sqlalchemy import create_engine
+
+from core import database, email_service
+from core.database import Email, session_scope
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    previous = database._engine
+    database.set_engine(create_engine("sqlite://", future=True))
+    database.init_db(force=True)
+    yield
+    database.set_engine(previous)
+
+
+def test_failing_emails_back_off_and_stop_at_the_cap(memory_db, monkeypatch):
+    with session_scope() as db:
+        db.add_all([Email(gmail_id="bad", body="garbled"), Email(gmail_id="good", body="Lunch on Friday?")])
+
+    monkeypatch.setattr(email_service, "summarize_email_content", lambda body: body)
+    monkeypatch.setattr(email_service, "classify_summaries", lambda summaries: [
+        None if summary == "garbled" else {"label": "email", "subtype": "SCHEDULE_REQUEST"} for summary in summaries
+    ])
+    monkeypatch.setattr(email_service, "BATCH_TRIAGE", True)
+    monkeypatch.setattr(email_service.triage_cache, "store", lambda *args: None)
+    monkeypatch.setattr(email_service, "RETRIAGE_MAX_ATTEMPTS", 2)
+
+    def attempts():
+        with session_scope() as db:
+            return db.query(Email).filter_by(gmail_id="bad").one().triage_attempts
+
+    def backoff_elapsed():
+        with session_scope() as db:
+            db.query(Email).filter_by(gmail_id="bad").one().next_triage_at = None
+
+    assert email_service.retriage_pending() == 1
+    assert attempts() == 1
+
+    email_service.retriage_pending()
+    assert attempts() == 1  # still backing off, so not retried
+
+    backoff_elapsed()
+    email_service.retriage_pending()
+    assert attempts() == 2
+
+    backoff_elapsed()
+    email_service.retriage_pending()
+    assert attempts() == 2  # reached RETRIAGE_MAX_ATTEMPTS, no longer selected
@@ -0,0 +1,106 @@
+# tests/test_text_reducer.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.text_reducer import (
+    estimate_tokens,
+    html_to_text,
+    reduce_for_prompt,
+    reduce_text,
+    split_into_chunks,
+    strip_quoted_history,
+    strip_signature,
+)
+
+
+def test_html_to_text_drops_markup_and_styles():
+    html = """
+    <html><head><style>.a {color: red}</style><title>Newsletter</title></head>
+    <body><div>Hello&nbsp;team,</div><p>The report is <a href="https://example.com/r">here</a>.</p>
+    <script>track()</script></body></html>
+    """
+    assert html_to_text(html) == "Hello team,\n\nThe report is here (https://example.com/r)."
+
+
+def test_long_tracking_links_are_dropped():
+    html = f'<p><a href="https://t.example.com/{"x" * 200}">Read more</a></p>'
+    assert html_to_text(html) == "Read more"
+
+
+def test_strip_quoted_history():
+    text = (
+        "Sounds good, see you Friday.\n\n"
+        "On Mon, Jun 2, 2025 at 10:00 AM Jane Doe <jane@example.com>\nwrote:\n"
+        "> Can we meet on Friday?\n"
+    )
+    assert strip_quoted_history(text) == "Sounds good, see you Friday."
+
+
+def test_strip_signature_and_boilerplate():
+    text = (
+        "Please review the attached contract.\n"
+        "Click here to unsubscribe from these emails.\n"
+        "-- \nJane Doe\nHead of Sales"
+    )
+    assert strip_signature(text) == "Please review the attached contract."
+
+
+def test_boilerplate_phrases_in_the_message_are_kept():
+    text = (
+        "Hi Sam,\n"
+        "Legal needs your sign-off on the new privacy policy by Friday, otherwise the launch slips.\n"
+        "Thanks"
+    )
+    assert reduce_text(text) == text
+    assert reduce_text("Please unsubscribe me from the weekly digest.") == "Please unsubscribe me from the weekly digest."
+
+
+def test_trailing_footer_block_is_stripped():
+    text = (
+        "Your order has shipped and arrives Tuesday.\n\n"
+        "Unsubscribe | Manage preferences\n"
+        "© 2025 Shop Inc. All rights reserved.\n"
+        "Privacy Policy"
+    )
+    assert strip_signature(text) == "Your order has shipped and arrives Tuesday."
+
+
+def test_only_rfc_signature_delimiter_cuts():
+    assert strip_signature("Q3 numbers below\n--\nRevenue 1.2M") == "Q3 numbers below\n--\nRevenue 1.2M"
+    assert strip_signature("Q3 numbers below\n-- \nJane") == "Q3 numbers below"
+
+
+def test_reduce_reports_token_counts():
+    html = "<style>" + ".x{}" * 500 + "</style><p>Invoice due Friday.</p>"
+    reduced = reduce_for_prompt(html)
+    assert reduced.text == "Invoice due Friday."
+    assert reduced.tokens_after < reduced.tokens_before
+
+
+def test_reduce_keeps_text_when_everything_is_quoted():
+    text = "> only a quoted line"
+    assert reduce_for_prompt(text).text == text
+
+
+def test_split_into_chunks_packs_paragraphs_under_the_limit():
+    paragraphs = [f"Paragraph {i} " + "word " * 40 for i in range(20)]
+    chunks = split_into_chunks("\n\n".join(paragraphs), max_tokens=200)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+    # Paragraph boundaries are kept: no paragraph is cut in half
+    assert sum(chunk.count("Paragraph") for chunk in chunks) == 20
+
+
+def test_split_into_chunks_breaks_oversized_paragraph_on_sentences():
+    paragraph = " ".join(f"Sentence number {i} is here." for i in range(200))
+    chunks = split_into_chunks(paragraph, max_tokens=100)
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.rstrip().endswith(".") for chunk in chunks)
+
+
+def test_split_into_chunks_short_text_is_one_chunk():
+    assert split_into_chunks("Hi,\n\nSee you at 5.", max_tokens=100) == ["Hi,\n\nSee you at 5."]
+
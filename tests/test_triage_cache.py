@@ -0,0 +1,23 @@
+# tests/test_triage_cache.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.triage_cache import content_key
+
+
+def test_different_ids_do_not_share_a_key():
+    assert content_key("Your order 400123456789 has shipped.", "m") != content_key(
+        "Your order 400987654321 has shipped.", "m"
+    )
+    assert content_key("Reset your password: https://x.example/reset?token=abc", "m") != content_key(
+        "Reset your password: https://x.example/reset?token=xyz", "m"
+    )
+
+
+def test_tracking_parameters_are_ignored():
+    assert content_key("Sale! https://shop.example/deals?utm_source=mail&utm_campaign=a&id=7", "m") == content_key(
+        "Sale!   https://shop.example/deals?id=7&utm_source=news&fbclid=123", "m"
+    )
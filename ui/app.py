@@ -1,35 +1,33 @@
 import os
 import json
 import asyncio
-from flask import Flask, render_template, request, redirect, url_for, flash
-from core.email_service import set_monitored_email, fetch_emails, send_email
-from core.email_classifier import classify_email
-from core.email_rewriter import rewrite_email
-from core.ai_responder import draft_reply  # ✅ ADDED IMPORT
+from flask import Flask, Response, render_template, request, redirect, url_for, flash
+from core.email_service import set_monitored_email, fetch_emails
+from core.outbox_worker import queue_email
+from core.email_rewriter import rewrite_email, stream_rewrite
+from core.ai_responder import draft_reply, stream_draft_reply  # ✅ ADDED IMPORT
 from core.database import session_scope, Email
-from core.database import engine, Base
+from core.database import init_db
 from core.database import session_scope, Email, Reminder, Meeting
 from core.database import log_meeting
 from markupsafe import Markup
 from core.helpers import markdownify
+from core.settings_store import get_settings
 
 
-# Ensure tables are created
-Base.metadata.create_all(bind=engine)
-
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
 app.jinja_env.filters["markdown"] = lambda text: Markup(markdownify(text))
 
 
-SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "../.secrets/settings.json")
+@app.before_request
+def ensure_schema():
+    # Tables (and newly added columns) are created on the first request, not at import
+    init_db()
+
 
 def get_monitored_email():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, "r") as file:
-            settings = json.load(file)
-            return settings.get("monitored_email", "Not Set")
-    return "Not Set"
+    return get_settings().monitored_email or "Not Set"
 
 @app.route("/")
 def index():
@@ -77,6 +75,21 @@ def fetch():
     flash(f"✅ Fetched {len(new_emails)} new emails.", "success")
     return redirect(url_for("emails"))
 
+@app.route("/gmail/push", methods=["POST"])
+def gmail_push():
+    """Pub/Sub push endpoint for Gmail watch notifications; acks fast and syncs in the background."""
+    from core.push_notifications import VERIFICATION_TOKEN, handle_notification, parse_push_envelope
+
+    if VERIFICATION_TOKEN and request.args.get("token") != VERIFICATION_TOKEN:
+        return "", 403
+    try:
+        notification = parse_push_envelope(request.get_json(force=True, silent=True))
+    except ValueError as e:
+        print(f"⚠️ Rejecting malformed push notification: {e}")
+        return "", 400
+    handle_notification(notification)
+    return "", 204
+
 @app.route("/send", methods=["GET", "POST"])
 def send():
     if request.method == "POST":
@@ -86,8 +99,8 @@ def send():
         if not to_email or not subject or not message_text:
             flash("❌ All fields are required.", "danger")
         else:
-            success, response = send_email(to_email, subject, message_text)
-            flash(response, "success" if success else "danger")
+            queue_email(get_settings().monitored_email or "me", to_email, subject, message_text)
+            flash(f"📤 Email to {to_email} queued for delivery.", "success")
         return redirect(url_for("send"))
     return render_template("send.html")
 
@@ -161,7 +174,7 @@ def generate_draft(email_id):
             flash(f"⚠️ Email ID {email_id} has no snippet to summarize.", "warning")
             return redirect(url_for("emails"))
         try:
-            generated_draft = draft_reply(email.snippet)
+            generated_draft = draft_reply(email.snippet, use_cache=not request.form.get("regenerate"))
             email.draft_reply = generated_draft
             db.commit()
             flash(f"✅ Draft reply generated for email ID {email_id}.", "success")
@@ -189,7 +202,7 @@ def generate_draft_action(email_id):
             flash(f"⚠️ Email ID {email_id} has no snippet to summarize.", "warning")
             return redirect(url_for('respond_to_email', email_id=email_id))
         try:
-            generated_draft = draft_reply(email.snippet)
+            generated_draft = draft_reply(email.snippet, use_cache=not request.form.get("regenerate"))
             email.draft_reply = generated_draft
             db.commit()
             flash(f"✅ Draft generated!", "success")
@@ -208,7 +221,7 @@ def rewrite_draft_action(email_id):
         return redirect(url_for('respond_to_email', email_id=email_id))
 
     try:
-        rewritten_text = asyncio.run(rewrite_email(current_draft, tone))
+        rewritten_text = asyncio.run(rewrite_email(current_draft, tone, use_cache=not request.form.get("regenerate")))
         with session_scope() as db:
             email = db.query(Email).filter(Email.id == email_id).first()
             if email:
@@ -220,6 +233,51 @@ def rewrite_draft_action(email_id):
 
     return redirect(url_for('respond_to_email', email_id=email_id))
 
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route("/email/<int:email_id>/draft/stream", methods=["POST"])
+def stream_draft_action(email_id):
+    """Streams a new (mode=draft) or rewritten (mode=rewrite) reply as server-sent events; saves it once complete."""
+    mode = request.form.get("mode", "draft")
+    use_cache = not request.form.get("regenerate")
+    with session_scope() as db:
+        email = db.query(Email).filter(Email.id == email_id).first()
+        if not email:
+            return {"error": f"Email ID {email_id} not found."}, 404
+        snippet = email.snippet
+
+    if mode == "rewrite":
+        current_draft = request.form.get("final_draft", "")
+        if not current_draft:
+            return {"error": "No draft provided to rewrite."}, 400
+        pieces = stream_rewrite(current_draft, request.form.get("tone", "polite and professional"), use_cache)
+    else:
+        if not snippet:
+            return {"error": f"Email ID {email_id} has no snippet to summarize."}, 400
+        pieces = stream_draft_reply(snippet, use_cache=use_cache)
+
+    def events():
+        parts = []
+        try:
+            for piece in pieces:
+                parts.append(piece)
+                yield _sse("token", {"text": piece})
+        except Exception as e:
+            yield _sse("error", {"message": str(e)})
+            return
+        text = "".join(parts).strip()
+        with session_scope() as db:
+            stored = db.query(Email).filter(Email.id == email_id).first()
+            if stored:
+                stored.draft_reply = text
+        yield _sse("done", {"text": text})
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.route("/email/<int:email_id>/send", methods=["POST"])
 def send_reply_action(email_id):
     final_draft = request.form.get("final_draft", "")
@@ -231,16 +289,10 @@ def send_reply_action(email_id):
         if not email:
             flash(f"❌ Email ID {email_id} not found.", "danger")
             return redirect(url_for('emails'))
-        try:
-            success, message = send_email(email.from_addr, f"RE: {email.subject}", final_draft)
-            if success:
-                email.sent = True
-                db.commit()
-                flash(f"✅ Reply sent!", "success")
-            else:
-                flash(f"❌ Failed to send: {message}", "danger")
-        except Exception as e:
-            flash(f"❌ Error sending email: {e}", "danger")
+        # Delivery (with retries) happens in the outbox worker; email.sent flips once Gmail confirms
+        queue_email(get_settings().monitored_email or "me", email.from_addr,
+                    f"RE: {email.subject}", final_draft, email_id=email.id)
+        flash("📤 Reply queued for delivery.", "success")
     return redirect(url_for('respond_to_email', email_id=email_id))
 
 from core.calendar_manager import schedule_meeting  # ✅ Correct function
@@ -525,4 +577,7 @@ def dashboard():
 
 
 if __name__ == "__main__":
+    from core.startup import warm_up
+
+    warm_up()
     app.run(debug=True)